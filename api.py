@@ -0,0 +1,283 @@
+"""
+Local read-only HTTP API over synced Google Fit data.
+
+Serves time-range queries per data type from the SQLite store (see
+GOOGLE_FIT_DB) plus the weekly/monthly/yearly rollup files, so dashboards
+don't each have to reload multi-year CSVs. Binds to localhost only.
+
+    python api.py --db google_fit.db --port 8765
+
+Endpoints:
+    GET /v1/types
+    GET /v1/data/<type>?start=2023-01-01&end=2024-01-01&limit=1000&page_token=...&format=json|arrow
+    GET /v1/rollups/<type>/<weekly|monthly|yearly>?format=json|arrow
+    GET /v1/plan?types=steps,sleep&start=2022-01-01&end=2024-01-01&historical=1&budget=2000
+"""
+
+import argparse
+import base64
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+import rollups
+import store
+from datatypes import DATA_SOURCES
+
+logger = logging.getLogger("google_fit_sync.api")
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+CACHE_SIZE = 256
+JSON_MIME = 'application/json'
+ARROW_MIME = 'application/vnd.apache.arrow.stream'
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+class QueryCache:
+    """Thread-safe LRU cache of encoded responses for hot ranges"""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+def parse_time(value, default):
+    """Accept 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS' and normalise to store format"""
+    if not value:
+        return default
+    try:
+        return store.format_time(datetime.datetime.fromisoformat(value))
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}")
+
+
+def parse_date(value):
+    """Parse an optional ISO date or datetime into a datetime"""
+    try:
+        return datetime.datetime.fromisoformat(value) if value else None
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}")
+
+
+def encode_page_token(row):
+    key = [row['start'], row['end'], row['source']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_page_token(token):
+    try:
+        start, end, source = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid page_token")
+    return start, end, source
+
+
+def to_arrow(rows):
+    """Encode rows as an Arrow IPC stream with typed timestamp columns"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise UnsupportedFormat("Arrow responses need pyarrow (pip install pyarrow)")
+
+    frame = pd.DataFrame(rows)
+    for column in ('start', 'end', 'period_start', 'period_end'):
+        if column in frame.columns:
+            frame[column] = pd.to_datetime(frame[column])
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(payload, rows, fmt):
+    """Return (content type, body bytes) for a response"""
+    if fmt == 'arrow':
+        return ARROW_MIME, to_arrow(rows)
+    if fmt == 'json':
+        return JSON_MIME, json.dumps(payload, default=str).encode()
+    raise UnsupportedFormat(f"Unknown format: {fmt}")
+
+
+class DataService:
+    """Range queries over the store and rollup files, with an LRU cache"""
+
+    def __init__(self, db_path, project_root):
+        self.project_root = project_root
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.lock = threading.Lock()
+        self.cache = QueryCache()
+
+    def version(self):
+        # data_version changes whenever another connection (a sync) commits
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def types(self):
+        with self.lock:
+            tables = store.list_tables(self.conn)
+        return [t for t in tables if t in DATA_SOURCES]
+
+    def data_page(self, data_type, query):
+        if data_type not in DATA_SOURCES:
+            raise KeyError(data_type)
+        start = parse_time(query.get('start'), '0000-01-01 00:00:00')
+        end = parse_time(query.get('end'), '9999-12-31 23:59:59')
+        limit = min(int(query.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        token = query.get('page_token')
+        after = decode_page_token(token) if token else None
+        fmt = query.get('format', 'json')
+
+        key = ('data', data_type, start, end, limit, after, fmt, self.version())
+        cached = self.cache.get(key)
+        if cached:
+            return cached
+
+        with self.lock:
+            rows = store.query_range(self.conn, data_type, start, end, limit=limit, after=after)
+        next_token = encode_page_token(rows[-1]) if len(rows) == limit else None
+        payload = {'data_type': data_type, 'rows': rows, 'next_page_token': next_token}
+        content_type, body = encode(payload, rows, fmt)
+        response = (content_type, body, next_token)
+        self.cache.put(key, response)
+        return response
+
+    def rollup(self, data_type, period, query):
+        if data_type not in rollups.ROLLUP_SPECS or period not in rollups.PERIODS:
+            raise KeyError(f"{data_type}/{period}")
+        path = rollups.rollup_path(self.project_root, DATA_SOURCES[data_type]['folder'], data_type, period)
+        if not os.path.exists(path):
+            raise KeyError(f"{data_type}/{period}")
+        fmt = query.get('format', 'json')
+
+        key = ('rollup', path, os.stat(path).st_mtime_ns, fmt)
+        cached = self.cache.get(key)
+        if cached:
+            return cached
+
+        rows = pd.read_csv(path, dtype={'period': str}).to_dict('records')
+        payload = {'data_type': data_type, 'period': period, 'rows': rows}
+        content_type, body = encode(payload, rows, fmt)
+        response = (content_type, body, None)
+        self.cache.put(key, response)
+        return response
+
+    def plan(self, query):
+        """Request plan for a sync of the given types; see planner.plan_sync"""
+        import planner
+
+        types = [t for t in query.get('types', '').split(',') if t] or list(DATA_SOURCES)
+        start = parse_date(query.get('start'))
+        end = parse_date(query.get('end'))
+        historical = query.get('historical', '1') not in ('0', 'false')
+        budget = int(query['budget']) if query.get('budget') else None
+        plan = planner.plan_sync(self.project_root, types, start, end, historical=historical, quota_budget=budget)
+        return JSON_MIME, json.dumps(plan, default=str).encode(), None
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        try:
+            if parts == ['v1', 'types']:
+                response = (JSON_MIME, json.dumps({'types': service.types()}).encode(), None)
+            elif len(parts) == 3 and parts[:2] == ['v1', 'data']:
+                response = service.data_page(parts[2], query)
+            elif len(parts) == 4 and parts[:2] == ['v1', 'rollups']:
+                response = service.rollup(parts[2], parts[3], query)
+            elif parts == ['v1', 'plan']:
+                response = service.plan(query)
+            else:
+                raise KeyError(url.path)
+        except KeyError as e:
+            return self.send_error_json(404, f"Not found: {e}")
+        except UnsupportedFormat as e:
+            return self.send_error_json(406, str(e))
+        except ValueError as e:
+            return self.send_error_json(400, str(e))
+
+        content_type, body, next_token = response
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if next_token:
+            self.send_header('X-Next-Page-Token', next_token)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        body = json.dumps({'error': message}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', JSON_MIME)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info(format, *args)
+
+
+def serve(db_path, project_root, port=8765):
+    """Run the API on localhost until interrupted"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), ApiHandler)
+    server.service = DataService(db_path, project_root)
+    logger.info("Serving %s on http://127.0.0.1:%d", db_path, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synced Google Fit data over a local HTTP API")
+    parser.add_argument('--root', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="data folder containing the <Folder>/Raw and <Folder>/Rollups outputs")
+    parser.add_argument('--db', default=os.getenv("GOOGLE_FIT_DB", "google_fit.db"),
+                        help="SQLite store written by the sync (relative to --root)")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    db_path = os.path.join(args.root, args.db)
+    if not os.path.exists(db_path):
+        parser.error(f"No database at {db_path}; run a sync with GOOGLE_FIT_DB set first")
+    serve(db_path, args.root, args.port)
+
+
+if __name__ == '__main__':
+    main()
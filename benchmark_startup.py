@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Start-up benchmark for the app or a built executable.
+
+Launches the app several times with GOOGLE_FIT_STARTUP_BENCHMARK set. The app
+records when its window was drawn and when the first aggregate request was
+ready to send, then quits. Times are measured from launch, so for a packaged
+app they include unpacking by the PyInstaller bootloader.
+
+    python benchmark_startup.py                                  # python main.py
+    python benchmark_startup.py --runs 5 -- dist/GoogleFitSync/GoogleFitSync
+    python benchmark_startup.py --max-window 2.0 -- dist/GoogleFitSync.exe
+
+Exits with status 1 if the median time-to-window exceeds --max-window.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Reported timing and the mark the app records for it
+METRICS = (('time_to_main', 'main_imported'), ('time_to_window', 'window'), ('time_to_first_request', 'first_request'))
+
+
+def measure(command, timeout):
+    """Launch command once and return its timings in seconds from launch"""
+    fd, marks_path = tempfile.mkstemp(prefix='startup_', suffix='.json')
+    os.close(fd)
+    os.remove(marks_path)
+    env = dict(os.environ, GOOGLE_FIT_STARTUP_BENCHMARK=marks_path)
+    try:
+        launched = time.time()
+        subprocess.run(command, env=env, timeout=timeout, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(marks_path) as f:
+            marks = json.load(f)
+    finally:
+        if os.path.exists(marks_path):
+            os.remove(marks_path)
+
+    if 'error' in marks:
+        raise RuntimeError(f"First request failed: {marks['error']}")
+    return {name: marks[mark] - launched for name, mark in METRICS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time-to-window and time-to-first-request")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=120, help="seconds to wait for each launch")
+    parser.add_argument('--max-window', type=float, default=None,
+                        help="fail if the median time-to-window is above this many seconds")
+    parser.add_argument('--json', help="also write the results to this file")
+    parser.add_argument('command', nargs=argparse.REMAINDER,
+                        help="app to launch after --; defaults to this interpreter running main.py")
+    args = parser.parse_args()
+
+    command = [c for c in args.command if c != '--']
+    if not command:
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')]
+
+    runs = []
+    for i in range(args.runs):
+        runs.append(measure(command, args.timeout))
+        print(f"run {i + 1}: " + ", ".join(f"{name}={value:.2f}s" for name, value in runs[-1].items()))
+
+    summary = {}
+    for name in runs[0]:
+        values = [run[name] for run in runs]
+        summary[name] = {'median': statistics.median(values), 'min': min(values), 'max': max(values)}
+        print(f"{name:>22}: median {summary[name]['median']:.2f}s  "
+              f"(min {summary[name]['min']:.2f}s, max {summary[name]['max']:.2f}s)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'command': command, 'runs': runs, 'summary': summary}, f, indent=2)
+
+    if args.max_window is not None and summary['time_to_window']['median'] > args.max_window:
+        print(f"❌ Median time-to-window is above {args.max_window:.2f}s")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,17 @@
 # Build script for Google Fit Data Sync executables
 # Works on both Mac and Windows (with Git Bash)
 
-echo "Building Google Fit Data Sync executable..."
+# Build profile: one-file by default, or a faster-starting one-folder build
+#   ./build_executable.sh --fast-start
+PROFILE="onefile"
+if [[ "$1" == "--fast-start" ]]; then
+    PROFILE="fast-start"
+fi
+
+# Optional modules pandas and numpy would otherwise pull in; the app never uses them
+FAST_START_EXCLUDES="pandas.tests numpy.tests pytest IPython matplotlib scipy sqlalchemy openpyxl xlrd tables jinja2"
+
+echo "Building Google Fit Data Sync executable ($PROFILE)..."
 echo "Platform: $(uname -s)"
 
 # Create virtual environment if it doesn't exist
@@ -26,27 +36,55 @@ pip install google-auth google-auth-oauthlib google-auth-httplib2 google-api-pyt
 
 # Build executable
 echo "Building executable..."
+if [[ "$PROFILE" == "fast-start" ]]; then
+    # Nothing is unpacked at launch, and the hooks in pyinstaller_hooks bundle
+    # only the Fitness API discovery document
+    PYINSTALLER_ARGS="--onedir --noupx --additional-hooks-dir pyinstaller_hooks"
+    for module in $FAST_START_EXCLUDES; do
+        PYINSTALLER_ARGS="$PYINSTALLER_ARGS --exclude-module $module"
+    done
+    SUFFIX="-Fast"
+else
+    PYINSTALLER_ARGS="--onefile"
+    SUFFIX=""
+fi
+
 if [[ "$OSTYPE" == "msys" || "$OSTYPE" == "win32" ]]; then
     # Windows build
-    pyinstaller --onefile --windowed --name "GoogleFitSync-Windows" main.py
-    echo "Windows executable created: dist/GoogleFitSync-Windows.exe"
+    NAME="GoogleFitSync-Windows$SUFFIX"
+    pyinstaller $PYINSTALLER_ARGS --windowed --name "$NAME" main.py
+    if [[ "$PROFILE" == "fast-start" ]]; then
+        EXECUTABLE="dist/$NAME/$NAME.exe"
+    else
+        EXECUTABLE="dist/$NAME.exe"
+    fi
+    echo "Windows executable created: $EXECUTABLE"
 else
     # Mac build
-    pyinstaller --onefile --windowed --name "GoogleFitSync-Mac" main.py
-    echo "Mac executable created: dist/GoogleFitSync-Mac"
-    echo "Mac app bundle created: dist/GoogleFitSync-Mac.app"
+    NAME="GoogleFitSync-Mac$SUFFIX"
+    pyinstaller $PYINSTALLER_ARGS --windowed --name "$NAME" main.py
+    if [[ "$PROFILE" == "fast-start" ]]; then
+        EXECUTABLE="dist/$NAME/$NAME"
+    else
+        EXECUTABLE="dist/$NAME"
+    fi
+    echo "Mac executable created: $EXECUTABLE"
+    echo "Mac app bundle created: dist/$NAME.app"
 fi
 
 echo "Build complete!"
 echo ""
 echo "To run the executable:"
 if [[ "$OSTYPE" == "msys" || "$OSTYPE" == "win32" ]]; then
-    echo "  Double-click: dist/GoogleFitSync-Windows.exe"
+    echo "  Double-click: $EXECUTABLE"
 else
-    echo "  Double-click: dist/GoogleFitSync-Mac.app"
-    echo "  Or terminal: ./dist/GoogleFitSync-Mac"
+    echo "  Double-click: dist/$NAME.app"
+    echo "  Or terminal: ./$EXECUTABLE"
 fi
 echo ""
+echo "To measure start-up time:"
+echo "  python benchmark_startup.py -- $EXECUTABLE"
+echo ""
 echo "Remember to set up OAuth credentials:"
 echo "  export GOOGLE_CLIENT_ID='your_client_id'"
 echo "  export GOOGLE_CLIENT_SECRET='your_client_secret'"
@@ -0,0 +1,176 @@
+"""
+Per-window checkpoints for historical backfills.
+
+Every completed aggregate window is written to its own small CSV under
+<Folder>/Raw/.checkpoints/<data_type>/ and recorded in a journal file in the
+project root. A backfill that dies partway can then resume at the first
+window that is not yet in the journal instead of starting again at 2022.
+
+The journal also keeps a list of windows that failed after all retries, so
+they can be re-fetched on their own later.
+"""
+
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+
+import writers
+
+JOURNAL_NAME = '.sync_journal.json'
+
+# Journal section listing windows that failed after all retries
+FAILED_KEY = 'failed_windows'
+
+_lock = threading.Lock()
+
+
+def journal_path(project_root):
+    return os.path.join(project_root, JOURNAL_NAME)
+
+
+def checkpoint_dir(project_root, folder, data_type):
+    return os.path.join(project_root, folder, "Raw", ".checkpoints", data_type)
+
+
+def load_journal(project_root):
+    """Read the journal, returning an empty one if it is missing or unreadable"""
+    path = journal_path(project_root)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_journal(project_root, journal):
+    """Write the journal atomically so a crash never leaves half a file"""
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(journal, f, indent=2)
+
+    writers.replace_atomically(write, journal_path(project_root))
+
+
+def begin(project_root, folder, data_type, start_date):
+    """Start or resume a backfill; returns the number of windows already done"""
+    with _lock:
+        journal = load_journal(project_root)
+        entry = journal.get(data_type)
+        if entry and not entry.get('complete') and entry.get('start') == start_date.isoformat():
+            return len(entry['windows'])
+
+        # Previous backfill finished (or covered another range): start fresh
+        shutil.rmtree(checkpoint_dir(project_root, folder, data_type), ignore_errors=True)
+        journal[data_type] = {'start': start_date.isoformat(), 'complete': False, 'windows': {}}
+        save_journal(project_root, journal)
+        return 0
+
+
+def done_windows(project_root, data_type, start_date):
+    """{start_time: end_time} of windows a backfill from start_date would skip, without starting one"""
+    entry = load_journal(project_root).get(data_type)
+    if not entry or entry.get('complete') or entry.get('start') != start_date.isoformat():
+        return {}
+    return {int(start): end for start, end in entry['windows'].items()}
+
+
+def is_done(project_root, data_type, start_time, end_time):
+    """True if this exact window was already fetched by the current backfill"""
+    entry = load_journal(project_root).get(data_type)
+    if not entry or entry.get('complete'):
+        return False
+    # The trailing window ends at "now", so only an identical end counts
+    return entry['windows'].get(str(start_time)) == end_time
+
+
+def save_window(project_root, folder, data_type, start_time, end_time, rows):
+    """Make one window's rows durable, then record it in the journal"""
+    if rows:
+        output_file = os.path.join(checkpoint_dir(project_root, folder, data_type), f'{start_time}.csv')
+        writers.write_csv(rows, output_file)
+
+    with _lock:
+        journal = load_journal(project_root)
+        entry = journal.setdefault(data_type, {'start': None, 'complete': False, 'windows': {}})
+        entry['windows'][str(start_time)] = end_time
+        save_journal(project_root, journal)
+
+
+def load_rows(project_root, folder, data_type):
+    """Return every checkpointed row for a data type, oldest window first"""
+    output_dir = checkpoint_dir(project_root, folder, data_type)
+    if not os.path.isdir(output_dir):
+        return []
+    parts = sorted((f for f in os.listdir(output_dir) if f.endswith('.csv')), key=lambda f: int(f[:-4]))
+    frames = [pd.read_csv(os.path.join(output_dir, f), parse_dates=['start', 'end']) for f in parts]
+    if not frames:
+        return []
+    return pd.concat(frames, ignore_index=True).to_dict('records')
+
+
+def finish(project_root, folder, data_type):
+    """Mark a backfill complete and drop its window files"""
+    with _lock:
+        journal = load_journal(project_root)
+        if data_type in journal:
+            journal[data_type]['complete'] = True
+            save_journal(project_root, journal)
+    shutil.rmtree(checkpoint_dir(project_root, folder, data_type), ignore_errors=True)
+
+
+def record_failure(project_root, data_type, start_time, end_time, error):
+    """Remember a window that could not be fetched, for a targeted re-fetch"""
+    with _lock:
+        journal = load_journal(project_root)
+        failures = journal.setdefault(FAILED_KEY, {}).setdefault(data_type, {})
+        previous = failures.get(str(start_time), {})
+        failures[str(start_time)] = {
+            'end': end_time,
+            'error': error,
+            'attempts': previous.get('attempts', 0) + 1
+        }
+        save_journal(project_root, journal)
+
+
+def clear_failure(project_root, data_type, start_time):
+    """Forget a failed window once it has been fetched"""
+    with _lock:
+        journal = load_journal(project_root)
+        failures = journal.get(FAILED_KEY, {}).get(data_type, {})
+        if str(start_time) not in failures:
+            return
+        del failures[str(start_time)]
+        save_journal(project_root, journal)
+
+
+def failed_windows(project_root, data_type):
+    """Return [(start_time, end_time, error)] for a data type's failed windows"""
+    failures = load_journal(project_root).get(FAILED_KEY, {}).get(data_type, {})
+    return sorted((int(start), info['end'], info['error']) for start, info in failures.items())
+
+
+def clear_failures_within(project_root, data_type, intervals):
+    """Forget failed windows fully covered by the fetched (start_time, end_time) intervals"""
+    covered = []
+    for start, end in sorted(intervals):
+        if covered and start <= covered[-1][1]:
+            covered[-1] = (covered[-1][0], max(covered[-1][1], end))
+        else:
+            covered.append((start, end))
+
+    with _lock:
+        journal = load_journal(project_root)
+        failures = journal.get(FAILED_KEY, {}).get(data_type, {})
+        cleared = [key for key, info in failures.items()
+                   if any(start <= int(key) and info['end'] <= end for start, end in covered)]
+        if not cleared:
+            return 0
+        for key in cleared:
+            del failures[key]
+        save_journal(project_root, journal)
+        return len(cleared)
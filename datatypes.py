@@ -0,0 +1,65 @@
+"""
+Google Fit data types synced by the app and how each one is requested and stored.
+
+Kept free of heavy imports so the GUI can use it before the engine loads.
+"""
+
+import os
+
+# Syncs write to the single token in the user's home directory
+SYNC_ACCOUNT = os.path.join(os.path.expanduser("~"), '.google_fit_token.json')
+
+# Data types offered in the GUI, in display order
+DATA_TYPES = [
+    ('steps', 'Steps (daily step count)'),
+    ('calories', 'Calories (burned calories)'),
+    ('distance', 'Distance (traveled distance)'),
+    ('heart_rate', 'Heart Rate (BPM measurements)'),
+    ('weight', 'Weight (body weight)'),
+    ('height', 'Height (body height)'),
+    ('body_fat', 'Body Fat (body fat percentage)'),
+    ('blood_pressure', 'Blood Pressure (systolic/diastolic)'),
+    ('blood_glucose', 'Blood Glucose (glucose levels)'),
+    ('oxygen_saturation', 'Oxygen Saturation (O2 levels)'),
+    ('body_temperature', 'Body Temperature (temperature)'),
+    ('sleep', 'Sleep (sleep segments)'),
+    ('reproductive_health', 'Reproductive Health (menstruation)')
+]
+
+# Aggregate request configuration and output folder for each data type
+DATA_SOURCES = {
+    'steps': {
+        'dataTypeName': 'com.google.step_count.delta',
+        'dataSourceId': 'derived:com.google.step_count.delta:com.google.android.gms:estimated_steps',
+        'folder': 'Steps'
+    },
+    'calories': {'dataTypeName': 'com.google.calories.expended', 'folder': 'Calories'},
+    'distance': {'dataTypeName': 'com.google.distance.delta', 'folder': 'Distance'},
+    'heart_rate': {'dataTypeName': 'com.google.heart_rate.bpm', 'folder': 'HeartRate'},
+    'weight': {'dataTypeName': 'com.google.weight', 'folder': 'Weight'},
+    'height': {'dataTypeName': 'com.google.height', 'folder': 'Height'},
+    'body_fat': {'dataTypeName': 'com.google.body.fat.percentage', 'folder': 'BodyFat'},
+    'blood_pressure': {'dataTypeName': 'com.google.blood_pressure', 'folder': 'BloodPressure'},
+    'blood_glucose': {'dataTypeName': 'com.google.blood_glucose', 'folder': 'BloodGlucose'},
+    'oxygen_saturation': {'dataTypeName': 'com.google.oxygen_saturation', 'folder': 'OxygenSaturation'},
+    'body_temperature': {'dataTypeName': 'com.google.body.temperature', 'folder': 'BodyTemperature'},
+    'sleep': {'dataTypeName': 'com.google.sleep.segment', 'folder': 'Sleep'},
+    'reproductive_health': {'dataTypeName': 'com.google.menstruation', 'folder': 'ReproductiveHealth'}
+}
+
+# Output columns for each data type as (column, value key) in point value order
+VALUE_FIELDS = {
+    'steps': [('steps', 'intVal')],
+    'calories': [('calories', 'fpVal')],
+    'distance': [('distance_meters', 'fpVal')],
+    'heart_rate': [('heart_rate_bpm', 'fpVal')],
+    'weight': [('weight_kg', 'fpVal')],
+    'height': [('height_meters', 'fpVal')],
+    'body_fat': [('body_fat_percentage', 'fpVal')],
+    'blood_pressure': [('systolic_mmHg', 'fpVal'), ('diastolic_mmHg', 'fpVal')],
+    'blood_glucose': [('glucose_mmol_per_L', 'fpVal')],
+    'oxygen_saturation': [('oxygen_saturation_percentage', 'fpVal')],
+    'body_temperature': [('temperature_celsius', 'fpVal')],
+    'sleep': [('sleep_type', 'intVal')],
+    'reproductive_health': [('menstruation_flow', 'intVal')]
+}
@@ -0,0 +1,619 @@
+"""
+Google Fit sync engine.
+
+Authorizes with Google, pages through the aggregate API in 30-day windows and
+writes each data type to <Folder>/Raw, the optional SQLite store, rollups and
+derived metrics. main.py imports this module only once the window is up, since
+pandas and the Google API client take most of the app's start-up time.
+"""
+
+import os
+import sys
+import datetime
+import pandas as pd
+from time import sleep
+
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+
+import checkpoints
+import gaps
+import jobs
+import metrics
+from datatypes import DATA_SOURCES, SYNC_ACCOUNT, VALUE_FIELDS
+import progress
+import rollups
+import store
+import tokens
+import writers
+
+# ALL VALID Google Fit API scopes from your screenshot
+SCOPES = [
+    'https://www.googleapis.com/auth/fitness.activity.read',
+    'https://www.googleapis.com/auth/fitness.blood_glucose.read',
+    'https://www.googleapis.com/auth/fitness.blood_pressure.read',
+    'https://www.googleapis.com/auth/fitness.body.read',
+    'https://www.googleapis.com/auth/fitness.heart_rate.read',
+    'https://www.googleapis.com/auth/fitness.body_temperature.read',
+    'https://www.googleapis.com/auth/fitness.location.read',
+    'https://www.googleapis.com/auth/fitness.nutrition.read',
+    'https://www.googleapis.com/auth/fitness.oxygen_saturation.read',
+    'https://www.googleapis.com/auth/fitness.reproductive_health.read',
+    'https://www.googleapis.com/auth/fitness.sleep.read'
+]
+
+# First day requested by a full historical import
+HISTORY_START = datetime.datetime(2022, 1, 1)
+
+# Request pacing and retry policy for aggregate calls
+REQUEST_DELAY_SECONDS = 1
+RATE_LIMIT_WAIT_SECONDS = 30
+WINDOW_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 2
+# Consecutive failed windows before a data type is abandoned for this run
+CIRCUIT_BREAKER_THRESHOLD = 3
+
+def resource_path(relative_path):
+    """Get absolute path to resource, works for dev and for PyInstaller"""
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+def run_sync(historical=False):
+    try:
+        fitness_service = get_fitness_service()
+
+        if historical:
+            start_date = HISTORY_START
+        else:
+            start_date = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+
+        end_date = datetime.datetime.utcnow()
+        current = start_date
+        all_rows = []
+
+        while current < end_date:
+            next_month = current + datetime.timedelta(days=30)
+            start_time = int(current.timestamp() * 1000)
+            end_time = int(min(next_month, end_date).timestamp() * 1000)
+
+            body = {
+                "aggregateBy": [{
+                    "dataTypeName": "com.google.step_count.delta",
+                    "dataSourceId": "derived:com.google.step_count.delta:com.google.android.gms:estimated_steps"
+                }],
+                "bucketByTime": {"durationMillis": 86400000},
+                "startTimeMillis": start_time,
+                "endTimeMillis": end_time
+            }
+
+            response = fitness_service.users().dataset().aggregate(userId='me', body=body).execute()
+
+            for bucket in response['bucket']:
+                for dataset in bucket['dataset']:
+                    for point in dataset['point']:
+                        steps = point['value'][0]['intVal']
+                        start = datetime.datetime.fromtimestamp(int(point['startTimeNanos']) / 1e9)
+                        end = datetime.datetime.fromtimestamp(int(point['endTimeNanos']) / 1e9)
+                        all_rows.append({'start': start, 'end': end, 'steps': steps})
+
+            current = next_month
+
+        # Save output to user-accessible directory
+        if getattr(sys, 'frozen', False):
+            # When running as packaged app
+            if sys.platform == 'darwin' and sys.executable.endswith('.app/Contents/MacOS/GoogleFitSync'):
+                # On Mac, save next to the .app bundle, not inside it
+                app_path = sys.executable.replace('/Contents/MacOS/GoogleFitSync', '')
+                project_root = os.path.dirname(app_path)
+            else:
+                # On Windows/Linux, save next to executable
+                project_root = os.path.dirname(sys.executable)
+        else:
+            # When running in development, use the script's directory
+            project_root = os.path.dirname(os.path.abspath(__file__))
+        
+        output_dir = os.path.join(project_root, "Steps", "Raw")
+        os.makedirs(output_dir, exist_ok=True)
+
+        if historical:
+            output_file = os.path.join(output_dir, 'steps_data_full.csv')
+        else:
+            output_file = os.path.join(output_dir, 'steps_data_daily.csv')
+
+        output_file = writers.write_csv(all_rows, output_file, *writers.compression_from_env())
+        
+        # Update status for user
+        progress.emit('status', "Collecting health data... (this may take a few minutes)")
+        
+        # Collect ALL available health data with rate limiting
+        health_data = collect_all_health_data(fitness_service, start_date, end_date, project_root, historical)
+        
+        if historical:
+            progress.emit('sync_done', f"✅ Full history saved! Steps data saved to: {output_file}", dialog=True)
+        else:
+            progress.emit('sync_done', "✅ Daily sync done!")
+
+    except Exception as e:
+        progress.emit('sync_failed', f"❌ Error: {e}", error=str(e), dialog=True)
+
+def collect_all_health_data(fitness_service, start_date, end_date, project_root, historical):
+    """Collect every health data type except steps"""
+    data_sources = {k: v for k, v in DATA_SOURCES.items() if k != 'steps'}
+    return collect_filtered_health_data(fitness_service, start_date, end_date, project_root, historical, data_sources)
+
+def get_project_root():
+    """Folder the data is saved in: next to the app when packaged, else next to this script"""
+    if getattr(sys, 'frozen', False):
+        if sys.platform == 'darwin' and sys.executable.endswith('.app/Contents/MacOS/GoogleFitSync'):
+            app_path = sys.executable.replace('/Contents/MacOS/GoogleFitSync', '')
+            project_root = os.path.dirname(app_path)
+        else:
+            project_root = os.path.dirname(sys.executable)
+    else:
+        project_root = os.path.dirname(os.path.abspath(__file__))
+    return project_root
+
+def get_fitness_service():
+    """Authorize with Google (reusing the saved token) and build the Fitness API client"""
+    client_id = os.getenv("GOOGLE_CLIENT_ID")
+    client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
+
+    if not client_id or not client_secret:
+        config_file = resource_path("oauth_config.json")
+        if os.path.exists(config_file):
+            import json
+            with open(config_file, 'r') as f:
+                config = json.load(f)
+            client_id = config.get("client_id")
+            client_secret = config.get("client_secret")
+
+    if not client_id or not client_secret:
+        raise Exception("OAuth credentials not found.")
+
+    client_config = {
+        "installed": {
+            "client_id": client_id,
+            "project_id": "dataautomation-464320",
+            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+            "client_secret": client_secret,
+            "redirect_uris": ["http://localhost"]
+        }
+    }
+
+    def authorize():
+        flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
+        for port in [8080, 8081, 8082, 8083, 0]:
+            try:
+                return flow.run_local_server(port=port)
+            except OSError as e:
+                if port == 0:
+                    raise e
+                continue
+
+    # Shared with every other sync thread and process; only one refreshes at a time
+    creds = tokens.load_credentials(SYNC_ACCOUNT, SCOPES, authorize)
+
+    return build('fitness', 'v1', credentials=creds)
+
+def sync_range(historical):
+    """(start, end) requested by a historical import or a daily sync started now"""
+    end_date = datetime.datetime.utcnow()
+    if historical:
+        return HISTORY_START, end_date
+    # From midnight, so daily buckets line up with the historical ones and
+    # yesterday's partial bucket is fetched again in full
+    start_date = datetime.datetime.combine((end_date - datetime.timedelta(days=1)).date(), datetime.time())
+    return start_date, end_date
+
+def sync_order(selected_data_types):
+    """Data types in the order run_sync_with_selection collects them: steps first"""
+    order = ['steps'] if 'steps' in selected_data_types else []
+    return order + [dt for dt in DATA_SOURCES if dt != 'steps' and dt in selected_data_types]
+
+def run_sync_with_selection(selected_data_types, historical=False, job=None):
+    """Run sync with only selected data types
+
+    When run by the job manager, job is checked between windows and any
+    failure is re-raised so the job records it.
+    """
+    try:
+        project_root = get_project_root()
+        fitness_service = get_fitness_service()
+
+        start_date, end_date = sync_range(historical)
+        
+        # Optional SQLite sink, enabled by pointing GOOGLE_FIT_DB at a database file
+        db = store.open_from_env(project_root)
+        
+        # Collect selected data types
+        saved_files = []
+        
+        try:
+            # Handle steps separately if selected
+            if 'steps' in selected_data_types:
+                steps_file = collect_steps_data(fitness_service, start_date, end_date, project_root, historical, db=db, job=job)
+                if steps_file:
+                    saved_files.append(steps_file)
+            
+            # Handle other health data if selected
+            other_data_types = [dt for dt in selected_data_types if dt != 'steps']
+            if other_data_types:
+                health_data = collect_selected_health_data(fitness_service, start_date, end_date, project_root, historical,
+                                                           other_data_types, db=db, job=job)
+                saved_files.extend([f for f in health_data.values() if f])
+        finally:
+            if db is not None:
+                db.close()
+        
+        # Show final results
+        if saved_files:
+            folder_name = os.path.basename(project_root)
+            result_text = f"✅ Data saved in '{folder_name}' folder ({len(saved_files)} files created)"
+        else:
+            result_text = "⚠️ No data was available for the selected types"
+            
+        progress.emit('sync_done', result_text, rows=len(saved_files), dialog=historical and bool(saved_files))
+        return saved_files
+            
+    except jobs.JobStopped as e:
+        progress.emit('sync_cancelled', f"⏹️ Sync stopped ({e}); progress so far is kept", error=str(e))
+        raise
+    except Exception as e:
+        progress.emit('sync_failed', f"❌ Error: {e}", error=str(e), dialog=True)
+        if job is not None:
+            raise
+
+def collect_steps_data(fitness_service, start_date, end_date, project_root, historical, db=None, job=None):
+    """Collect steps data specifically"""
+    health_data = collect_filtered_health_data(fitness_service, start_date, end_date, project_root, historical,
+                                               {'steps': DATA_SOURCES['steps']}, db=db, job=job)
+    return health_data.get('steps')
+
+def collect_selected_health_data(fitness_service, start_date, end_date, project_root, historical, selected_types, db=None, job=None):
+    """Collect only selected health data types"""
+    # Filter to only selected data sources
+    data_sources = {k: v for k, v in DATA_SOURCES.items() if k in selected_types}
+    return collect_filtered_health_data(fitness_service, start_date, end_date, project_root, historical, data_sources, db=db, job=job)
+
+def pause(seconds, job=None):
+    """Sleep between requests; a job's wait wakes early if it is cancelled"""
+    if job is None:
+        sleep(seconds)
+    else:
+        job.wait(seconds)
+
+def iter_windows(start_date, end_date):
+    """Yield the 30-day (start, end) request windows covering a date range"""
+    current = start_date
+    while current < end_date:
+        next_month = current + datetime.timedelta(days=30)
+        yield current, min(next_month, end_date)
+        current = next_month
+
+def parse_point(data_type, point):
+    """Turn one aggregate data point into an output row"""
+    row = {
+        'start': datetime.datetime.fromtimestamp(int(point['startTimeNanos']) / 1e9),
+        'end': datetime.datetime.fromtimestamp(int(point['endTimeNanos']) / 1e9)
+    }
+    for index, (column, value_key) in enumerate(VALUE_FIELDS[data_type]):
+        row[column] = point['value'][index].get(value_key, 0) if len(point['value']) > index else 0
+    row['source'] = point.get('originDataSourceId', '')
+    return row
+
+def aggregate_request(fitness_service, config, window_start, window_end):
+    """Build (without sending) the daily-bucketed aggregate request for one window"""
+    aggregate_by = {"dataTypeName": config['dataTypeName']}
+    if 'dataSourceId' in config:
+        aggregate_by["dataSourceId"] = config['dataSourceId']
+
+    body = {
+        "aggregateBy": [aggregate_by],
+        "bucketByTime": {"durationMillis": 86400000},
+        "startTimeMillis": int(window_start.timestamp() * 1000),
+        "endTimeMillis": int(window_end.timestamp() * 1000)
+    }
+    return fitness_service.users().dataset().aggregate(userId='me', body=body)
+
+def first_request_for_benchmark():
+    """Build the first request of a daily sync without credentials, for the start-up benchmark"""
+    fitness_service = build('fitness', 'v1', developerKey='startup-benchmark', static_discovery=True)
+    end_date = datetime.datetime.utcnow()
+    return aggregate_request(fitness_service, DATA_SOURCES['steps'], end_date - datetime.timedelta(days=1), end_date)
+
+def fetch_window(fitness_service, data_type, config, window_start, window_end):
+    """Run one daily-bucketed aggregate request and return its rows"""
+    response = aggregate_request(fitness_service, config, window_start, window_end).execute()
+
+    rows = []
+    for bucket in response['bucket']:
+        for dataset in bucket['dataset']:
+            for point in dataset['point']:
+                rows.append(parse_point(data_type, point))
+    return rows
+
+def is_rate_limit_error(e):
+    return "rateLimitExceeded" in str(e) or "429" in str(e)
+
+def is_permanent_error(e):
+    """Errors that retrying won't fix: missing scopes or data types, bad requests"""
+    status = getattr(getattr(e, 'resp', None), 'status', None)
+    if status in (400, 403, 404):
+        return True
+    return "Invalid scope" in str(e) or "forbidden" in str(e).lower()
+
+def fetch_window_with_retry(fitness_service, data_type, config, window_start, window_end, job=None):
+    """Fetch one window, waiting out rate limits and retrying other errors a few times"""
+    attempt = 0
+    while True:
+        try:
+            pause(REQUEST_DELAY_SECONDS, job)
+            return fetch_window(fitness_service, data_type, config, window_start, window_end)
+        except jobs.JobStopped:
+            raise
+        except Exception as e:
+            if is_rate_limit_error(e):
+                progress.emit('rate_limited', f"Rate limit hit for {data_type}, waiting {RATE_LIMIT_WAIT_SECONDS} seconds...",
+                              data_type=data_type, window=(window_start, window_end), error=str(e))
+                pause(RATE_LIMIT_WAIT_SECONDS, job)
+                continue  # Retry the same request
+            if is_permanent_error(e) or attempt >= WINDOW_RETRIES:
+                raise
+            attempt += 1
+            progress.emit('window_retry', f"Retrying {data_type} {window_start.strftime('%Y-%m')} ({attempt}/{WINDOW_RETRIES})...",
+                          data_type=data_type, window=(window_start, window_end), error=str(e))
+            pause(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1), job)
+
+def record_remaining_failures(project_root, data_type, start_date, end_date, error):
+    """Journal every window from start_date on as failed so a re-fetch can pick them up"""
+    for window_start, window_end in iter_windows(start_date, end_date):
+        checkpoints.record_failure(project_root, data_type, int(window_start.timestamp() * 1000),
+                                   int(window_end.timestamp() * 1000), f"skipped after: {error}")
+
+def collect_data_type(fitness_service, data_type, config, start_date, end_date, project_root, historical, label, db=None, job=None):
+    """Fetch every window of one data type; returns (rows, finished_all_windows)
+
+    Historical runs checkpoint each window, so a restarted backfill skips
+    the windows it already has and only requests the rest. When a SQLite
+    store is given, each window is upserted into it in one transaction.
+    A job is checked between windows and raises JobStopped to end the run.
+    """
+    if historical:
+        done = checkpoints.begin(project_root, config['folder'], data_type, start_date)
+        if done:
+            progress.emit('status', f"Resuming {data_type} backfill ({done} windows already saved)", data_type=data_type)
+
+    rows = []
+    finished = True
+    consecutive_failures = 0
+    for window_start, window_end in iter_windows(start_date, end_date):
+        if job is not None:
+            job.check()
+        start_time = int(window_start.timestamp() * 1000)
+        end_time = int(window_end.timestamp() * 1000)
+        if historical and checkpoints.is_done(project_root, data_type, start_time, end_time):
+            continue
+
+        try:
+            window_rows = fetch_window_with_retry(fitness_service, data_type, config, window_start, window_end, job)
+        except jobs.JobStopped:
+            raise
+        except Exception as e:
+            if is_permanent_error(e):
+                status = getattr(getattr(e, 'resp', None), 'status', None)
+                unavailable = status == 403 or "Invalid scope" in str(e) or "forbidden" in str(e).lower()
+                if unavailable or window_start == start_date:
+                    message = f"Skipping {data_type} (not available)" if unavailable else f"No {data_type} data found"
+                    progress.emit('type_skipped', message, data_type=data_type, window=(window_start, window_end), error=str(e))
+                    break  # Skip the rest of this data type
+
+                # Earlier windows had data, so keep the backfill open for --retry-failed
+                finished = False
+                record_remaining_failures(project_root, data_type, window_start, end_date, e)
+                progress.emit('type_skipped', f"Stopping {data_type} at {window_start.strftime('%Y-%m')}, will retry later",
+                              data_type=data_type, window=(window_start, window_end), error=str(e))
+                break
+
+            # Isolate the failure to this window and move on to the next one
+            finished = False
+            checkpoints.record_failure(project_root, data_type, start_time, end_time, str(e))
+            consecutive_failures += 1
+            progress.emit('window_failed', f"⚠️ {data_type} {window_start.strftime('%Y-%m')} failed, will retry later",
+                          data_type=data_type, window=(window_start, window_end), error=str(e))
+            if consecutive_failures >= CIRCUIT_BREAKER_THRESHOLD:
+                # Circuit open: record what is left so a re-fetch can pick it up
+                record_remaining_failures(project_root, data_type, window_end, end_date, e)
+                progress.emit('type_skipped', f"Stopping {data_type} after {consecutive_failures} failed windows in a row",
+                              data_type=data_type, error=str(e))
+                break
+            continue
+
+        consecutive_failures = 0
+        checkpoints.clear_failure(project_root, data_type, start_time)
+        if historical:
+            checkpoints.save_window(project_root, config['folder'], data_type, start_time, end_time, window_rows)
+        if db is not None:
+            store.upsert_rows(db, data_type, VALUE_FIELDS[data_type], window_rows,
+                              window=(window_start, window_end))
+        rows.extend(window_rows)
+        progress.emit('window', f"Collecting {data_type} data... {label} - {window_start.strftime('%Y-%m')}",
+                      data_type=data_type, window=(window_start, window_end), rows=len(window_rows))
+
+    if historical:
+        # Includes windows saved by earlier, interrupted runs
+        rows = checkpoints.load_rows(project_root, config['folder'], data_type)
+    return rows, finished
+
+def collect_filtered_health_data(fitness_service, start_date, end_date, project_root, historical, data_sources, db=None, job=None):
+    """Collect the given data types, writing one CSV per type"""
+    health_data = {}
+    compression, level = writers.compression_from_env()
+    export_arrow = writers.arrow_export_from_env()
+    
+    for i, (data_type, config) in enumerate(data_sources.items()):
+        try:
+            label = f"({i+1}/{len(data_sources)})"
+            progress.emit('type_started', f"Collecting {data_type} data... {label}", data_type=data_type)
+            rows, finished = collect_data_type(fitness_service, data_type, config, start_date, end_date,
+                                               project_root, historical, label, db=db, job=job)
+            
+            # Save data if we have any
+            if rows:
+                output_dir = os.path.join(project_root, config['folder'], "Raw")
+                os.makedirs(output_dir, exist_ok=True)
+                
+                arrow_file = os.path.join(output_dir, f'{data_type}_data.arrow')
+                if historical and finished:
+                    output_file = os.path.join(output_dir, f'{data_type}_data_full.csv')
+                    output_file = writers.write_csv(rows, output_file, compression, level)
+                    if export_arrow:
+                        writers.write_arrow(rows, arrow_file, VALUE_FIELDS[data_type])
+                elif historical:
+                    # A stopped run only has the windows saved since the last complete
+                    # backfill, so merge them rather than shrink the export
+                    output_file, merged = merge_full_export(project_root, data_type, rows)
+                    if export_arrow:
+                        writers.merge_arrow(merged, arrow_file, VALUE_FIELDS[data_type])
+                else:
+                    output_file = os.path.join(output_dir, f'{data_type}_data_daily.csv')
+                    output_file = writers.write_csv(rows, output_file, compression, level)
+                    # The daily file only holds this run; the full export keeps the
+                    # whole history that rollups and metrics are recomputed from
+                    merge_full_export(project_root, data_type, rows)
+                    if export_arrow:
+                        writers.write_arrow(rows, arrow_file, VALUE_FIELDS[data_type], append=True)
+                health_data[data_type] = output_file
+                progress.emit('type_saved', f"✅ {data_type} saved ({len(rows)} records)", data_type=data_type, rows=len(rows))
+
+                try:
+                    rollups.update_rollups(project_root, config['folder'], data_type, rows, db=db)
+                except Exception as e:
+                    progress.emit('status', f"⚠️ Could not update {data_type} rollups", data_type=data_type, error=str(e))
+                try:
+                    metrics.update_metrics(project_root, config['folder'], data_type, rows, db=db)
+                except Exception as e:
+                    progress.emit('status', f"⚠️ Could not update {data_type} metrics", data_type=data_type, error=str(e))
+            else:
+                health_data[data_type] = None
+                progress.emit('type_empty', f"⚠️ No {data_type} data found", data_type=data_type, rows=0)
+
+            if historical and finished:
+                checkpoints.finish(project_root, config['folder'], data_type)
+                
+        except jobs.JobStopped:
+            raise
+        except Exception as e:
+            health_data[data_type] = None
+            progress.emit('type_skipped', f"⚠️ {data_type} could not be saved: {e}", data_type=data_type, error=str(e))
+    
+    return health_data
+
+def merge_full_export(project_root, data_type, rows):
+    """Merge rows into a data type's full CSV export; returns (file, merged frame)"""
+    output_dir = os.path.join(project_root, DATA_SOURCES[data_type]['folder'], "Raw")
+    output_file = os.path.join(output_dir, f'{data_type}_data_full.csv')
+
+    merged = rollups.to_frame(rows)
+    existing_file = writers.find_output(output_file)
+    if existing_file:
+        existing = pd.read_csv(existing_file, parse_dates=['start', 'end'])
+        merged = writers.replace_overlapping(existing, merged)
+    merged['source'] = merged['source'].fillna('')
+    merged = merged.drop_duplicates(subset=['start', 'end', 'source'], keep='last').sort_values(['start', 'end'])
+
+    return writers.write_csv(merged, output_file, *writers.compression_from_env()), merged
+
+def merge_into_output(project_root, data_type, rows, db=None):
+    """Merge re-fetched rows into a data type's full export and rollups; returns the file"""
+    config = DATA_SOURCES[data_type]
+    output_dir = os.path.join(project_root, config['folder'], "Raw")
+    output_file, merged = merge_full_export(project_root, data_type, rows)
+    if writers.arrow_export_from_env():
+        # Daily syncs append batches the CSV merge never saw, so merge rather than rewrite
+        writers.merge_arrow(merged, os.path.join(output_dir, f'{data_type}_data.arrow'), VALUE_FIELDS[data_type])
+    rollups.update_rollups(project_root, config['folder'], data_type, rows, db=db)
+    metrics.update_metrics(project_root, config['folder'], data_type, rows, db=db)
+    return output_file
+
+def refetch_windows(fitness_service, project_root, data_type, windows, db=None, job=None):
+    """Fetch specific (start, end) windows of one data type; returns (rows, windows still failing)"""
+    rows = []
+    still_failing = 0
+    fetched = []
+    for window_start, window_end in windows:
+        if job is not None:
+            job.check()
+        start_time = int(window_start.timestamp() * 1000)
+        end_time = int(window_end.timestamp() * 1000)
+        try:
+            window_rows = fetch_window_with_retry(fitness_service, data_type, DATA_SOURCES[data_type],
+                                                  window_start, window_end, job)
+        except jobs.JobStopped:
+            raise
+        except Exception as e:
+            still_failing += 1
+            checkpoints.record_failure(project_root, data_type, start_time, end_time, str(e))
+            progress.emit('window_failed', f"⚠️ {data_type} {window_start.strftime('%Y-%m-%d')} still failing",
+                          data_type=data_type, window=(window_start, window_end), error=str(e))
+            continue
+
+        fetched.append((start_time, end_time))
+        if db is not None:
+            store.upsert_rows(db, data_type, VALUE_FIELDS[data_type], window_rows,
+                              window=(window_start, window_end))
+        rows.extend(window_rows)
+        progress.emit('window', f"Re-fetched {data_type} {window_start.strftime('%Y-%m-%d')}",
+                      data_type=data_type, window=(window_start, window_end), rows=len(window_rows))
+
+    # Re-fetch windows need not line up with the failed ones, so clear by coverage
+    checkpoints.clear_failures_within(project_root, data_type, fetched)
+    return rows, still_failing
+
+def refetch_and_merge(selected_data_types, plan, reason, job=None):
+    """Re-fetch the windows plan(project_root, data_type, db) returns for each type and merge them in"""
+    project_root = get_project_root()
+    db = store.open_from_env(project_root)
+    fitness_service = None
+    try:
+        for data_type in selected_data_types:
+            windows = plan(project_root, data_type, db)
+            if not windows:
+                progress.emit('type_empty', f"No {reason} {data_type} windows", data_type=data_type, rows=0)
+                continue
+            if fitness_service is None:
+                fitness_service = get_fitness_service()
+            progress.emit('type_started', f"Re-fetching {len(windows)} {reason} {data_type} windows", data_type=data_type)
+            rows, still_failing = refetch_windows(fitness_service, project_root, data_type, windows, db=db, job=job)
+            if rows:
+                merge_into_output(project_root, data_type, rows, db=db)
+            progress.emit('type_saved', f"✅ {data_type}: {len(windows) - still_failing} windows recovered, {still_failing} still failing",
+                          data_type=data_type, rows=len(rows))
+    finally:
+        if db is not None:
+            db.close()
+
+def retry_failed_windows(selected_data_types, job=None):
+    """Re-fetch only the windows recorded as failed by earlier syncs"""
+    def plan(project_root, data_type, db):
+        return [(datetime.datetime.fromtimestamp(start / 1000), datetime.datetime.fromtimestamp(end / 1000))
+                for start, end, _ in checkpoints.failed_windows(project_root, data_type)]
+
+    refetch_and_merge(selected_data_types, plan, "failed", job=job)
+
+def fill_gaps(selected_data_types, merge_gap_days=3, job=None):
+    """Find missing days and failed windows in the stored data and re-fetch only those"""
+    first_day = HISTORY_START.date()
+    # Today is still in progress, so it is never a gap
+    last_day = datetime.date.today() - datetime.timedelta(days=1)
+
+    def plan(project_root, data_type, db):
+        return gaps.plan_gap_fill(project_root, DATA_SOURCES[data_type]['folder'], data_type,
+                                  first_day, last_day, db=db, merge_gap_days=merge_gap_days)
+
+    refetch_and_merge(selected_data_types, plan, "missing", job=job)
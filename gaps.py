@@ -0,0 +1,106 @@
+"""
+Gap detection for stored data.
+
+Compares the days present in a data type's stored series with the daily
+bucket calendar, adds the windows recorded as failed in the sync journal, and
+turns the result into as few aggregate requests as possible. Only these
+requests need re-fetching instead of a full historical run.
+"""
+
+import datetime
+import os
+
+import pandas as pd
+
+import checkpoints
+import store
+import writers
+
+# Longest window a single aggregate request covers, as in the sync engine
+MAX_WINDOW_DAYS = 30
+
+# Types with a value for every day the phone was carried; sparser types
+# (weight, blood pressure, ...) are only checked for failed windows
+DAILY_TYPES = ('steps', 'calories', 'distance')
+
+
+def stored_days(project_root, folder, data_type, db=None):
+    """Set of dates that have at least one stored row"""
+    if db is not None:
+        table = store.table_name(data_type)
+        if table not in store.list_tables(db):
+            return set()
+        cursor = db.execute(f'SELECT DISTINCT substr("start", 1, 10) FROM "{table}"')
+        return {datetime.date.fromisoformat(day) for (day,) in cursor.fetchall()}
+
+    days = set()
+    raw_dir = os.path.join(project_root, folder, "Raw")
+    for name in (f'{data_type}_data_full.csv', f'{data_type}_data_daily.csv'):
+        path = writers.find_output(os.path.join(raw_dir, name))
+        if path:
+            starts = pd.read_csv(path, usecols=['start'], parse_dates=['start'])['start']
+            days.update(starts.dt.date.unique())
+    return days
+
+
+def missing_ranges(first_day, last_day, present_days):
+    """Inclusive (first, last) date ranges between first_day and last_day with no data"""
+    ranges = []
+    day = first_day
+    while day <= last_day:
+        if day in present_days:
+            day += datetime.timedelta(days=1)
+            continue
+        start = day
+        while day <= last_day and day not in present_days:
+            day += datetime.timedelta(days=1)
+        ranges.append((start, day - datetime.timedelta(days=1)))
+    return ranges
+
+
+def failed_ranges(project_root, data_type):
+    """Date ranges of windows the journal lists as failed"""
+    ranges = []
+    for start_time, end_time, _ in checkpoints.failed_windows(project_root, data_type):
+        start = datetime.datetime.fromtimestamp(start_time / 1000).date()
+        # end is exclusive; a window ending at midnight doesn't touch that day
+        end = datetime.datetime.fromtimestamp((end_time - 1) / 1000).date()
+        ranges.append((start, end))
+    return ranges
+
+
+def merge_ranges(ranges, merge_gap_days=3):
+    """Merge ranges that overlap or are separated by at most merge_gap_days days
+
+    Re-fetching a few days that are already stored is cheaper than an extra
+    request, so nearby gaps are covered by one range.
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and (start - merged[-1][1]).days <= merge_gap_days + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def to_requests(ranges, max_days=MAX_WINDOW_DAYS):
+    """Split inclusive date ranges into (start, end) datetime windows of at most max_days"""
+    windows = []
+    for first, last in ranges:
+        start = datetime.datetime.combine(first, datetime.time())
+        stop = datetime.datetime.combine(last + datetime.timedelta(days=1), datetime.time())
+        while start < stop:
+            end = min(start + datetime.timedelta(days=max_days), stop)
+            windows.append((start, end))
+            start = end
+    return windows
+
+
+def plan_gap_fill(project_root, folder, data_type, first_day, last_day, db=None, merge_gap_days=3):
+    """Windows to re-fetch for one data type between first_day and last_day"""
+    ranges = failed_ranges(project_root, data_type)
+    if data_type in DAILY_TYPES:
+        present = stored_days(project_root, folder, data_type, db)
+        ranges += missing_ranges(first_day, last_day, present)
+    return to_requests(merge_ranges(ranges, merge_gap_days))
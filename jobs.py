@@ -0,0 +1,173 @@
+"""
+Sync job manager.
+
+Every sync runs as a SyncJob on its own thread. Requests for the same account,
+data type selection and mode share one running job instead of starting a
+second sync that writes the same files, and so do requests for a subset of an
+active job's types. A job whose types overlap another active job on the same
+account is queued until that job finishes. Jobs stop cooperatively between
+windows when cancelled or when their time budget runs out.
+"""
+
+import itertools
+import threading
+import time
+
+import progress
+
+ACTIVE = ('queued', 'running')
+
+_ids = itertools.count(1)
+
+
+class JobStopped(Exception):
+    """Raised inside a sync when its job was cancelled or ran out of time"""
+
+
+class SyncJob:
+    def __init__(self, account, selected_types, historical, budget_seconds=None):
+        self.id = next(_ids)
+        self.account = account
+        self.selected_types = list(selected_types)
+        self.historical = historical
+        self.key = (account, tuple(sorted(selected_types)), historical)
+        self.budget_seconds = budget_seconds
+        self.status = 'queued'
+        self.error = None
+        self.result = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._deadline = None
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        # Active jobs syncing some of the same types that must finish first
+        self._blockers = []
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def overlaps(self, other):
+        return self.account == other.account and not set(self.selected_types).isdisjoint(other.selected_types)
+
+    def covers(self, other):
+        """True if this job syncs everything other asks for"""
+        return (self.account == other.account and self.historical == other.historical
+                and set(other.selected_types) <= set(self.selected_types))
+
+    def timed_out(self):
+        return self._deadline is not None and time.monotonic() >= self._deadline
+
+    def check(self):
+        """Raise JobStopped if the sync should stop now"""
+        if self.cancelled():
+            raise JobStopped("cancelled")
+        if self.timed_out():
+            raise JobStopped(f"time budget of {self.budget_seconds:.0f}s exceeded")
+
+    def wait(self, seconds):
+        """Sleep for up to seconds, waking early on cancellation or deadline"""
+        if self._deadline is not None:
+            seconds = max(0, min(seconds, self._deadline - time.monotonic()))
+        self._cancelled.wait(seconds)
+        self.check()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'account': self.account,
+            'selected_types': self.selected_types,
+            'historical': self.historical,
+            'status': self.status,
+            'waiting_for': [j.id for j in self._blockers if j.status in ACTIVE],
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobManager:
+    """Runs sync jobs, merging duplicate requests into the active job and queueing overlapping ones"""
+
+    def __init__(self, run):
+        # run(selected_types, historical=..., job=...) performs the sync
+        self.run = run
+        self._jobs = []
+        self._lock = threading.Lock()
+
+    def submit(self, account, selected_types, historical, budget_seconds=None):
+        """Start a job, or return the active one covering it; returns (job, created)
+
+        A new job that overlaps an active one starts once that job is done.
+        """
+        job = SyncJob(account, selected_types, historical, budget_seconds)
+        with self._lock:
+            active = [j for j in self._jobs if j.status in ACTIVE]
+            for existing in active:
+                if existing.covers(job):
+                    return existing, False
+            job._blockers = [j for j in active if j.overlaps(job)]
+            self._jobs.append(job)
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        return job, True
+
+    def _run(self, job):
+        try:
+            for blocker in job._blockers:
+                while not blocker._finished.wait(0.5):
+                    job.check()
+            job.check()
+            job.status = 'running'
+            job.started_at = time.time()
+            if job.budget_seconds is not None:
+                job._deadline = time.monotonic() + job.budget_seconds
+            job.result = self.run(job.selected_types, historical=job.historical, job=job)
+            job.status = 'done'
+        except JobStopped as e:
+            job.status = 'cancelled' if job.cancelled() else 'timed_out'
+            job.error = str(e)
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job._finished.set()
+            progress.logger.info("Sync job %d %s%s", job.id, job.status, f": {job.error}" if job.error else "")
+
+    def cancel(self, job_id=None):
+        """Cancel one job, or every active job when job_id is None"""
+        with self._lock:
+            targets = [j for j in self._jobs if j.status in ACTIVE and job_id in (None, j.id)]
+        for job in targets:
+            job.cancel()
+        return len(targets)
+
+    def active(self):
+        with self._lock:
+            return [j for j in self._jobs if j.status in ACTIVE]
+
+    def status(self):
+        """Snapshot of every job this manager has run"""
+        with self._lock:
+            return [j.to_dict() for j in self._jobs]
+
+
+def describe(statuses):
+    """One-line readout of the active jobs, or of the last finished one"""
+    active = [s for s in statuses if s['status'] in ACTIVE]
+    if not active:
+        if not statuses:
+            return ""
+        # A job that just left ACTIVE may not have its finish time set yet
+        last = max(statuses, key=lambda s: s['finished_at'] or 0)
+        return f"Last sync: job {last['id']} {last['status']}"
+    parts = []
+    for s in active:
+        mode = "full history" if s['historical'] else "daily"
+        waiting = f" behind job {', '.join(map(str, s['waiting_for']))}" if s['waiting_for'] else ""
+        parts.append(f"Job {s['id']} {s['status']}{waiting} ({mode}: {', '.join(s['selected_types'])})")
+    return " · ".join(parts)
@@ -1,346 +1,41 @@
+import json
 import os
 import sys
-import datetime
 import threading
 import time
-import pandas as pd
+import logging
+import multiprocessing
 import tkinter.messagebox as messagebox
-from time import sleep
 
 from tkinter import Tk, Button, Label, Checkbutton, IntVar, Frame, Scrollbar, Canvas, VERTICAL
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 
-# ALL VALID Google Fit API scopes from your screenshot
-SCOPES = [
-    'https://www.googleapis.com/auth/fitness.activity.read',
-    'https://www.googleapis.com/auth/fitness.blood_glucose.read',
-    'https://www.googleapis.com/auth/fitness.blood_pressure.read',
-    'https://www.googleapis.com/auth/fitness.body.read',
-    'https://www.googleapis.com/auth/fitness.heart_rate.read',
-    'https://www.googleapis.com/auth/fitness.body_temperature.read',
-    'https://www.googleapis.com/auth/fitness.location.read',
-    'https://www.googleapis.com/auth/fitness.nutrition.read',
-    'https://www.googleapis.com/auth/fitness.oxygen_saturation.read',
-    'https://www.googleapis.com/auth/fitness.reproductive_health.read',
-    'https://www.googleapis.com/auth/fitness.sleep.read'
-]
+# Only light modules load before the window; the engine (pandas, Google API
+# client) is imported by load_engine() once the window is on screen
+import jobs
+from datatypes import DATA_TYPES, SYNC_ACCOUNT
+import progress
 
-def resource_path(relative_path):
-    """Get absolute path to resource, works for dev and for PyInstaller"""
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+# Total time budget per sync run before it stops between windows
+HISTORICAL_BUDGET_SECONDS = 6 * 3600
+DAILY_BUDGET_SECONDS = 30 * 60
 
-def run_sync(historical=False):
-    try:
-        # OAuth configuration from environment variables or config file
-        client_id = os.getenv("GOOGLE_CLIENT_ID")
-        client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
-        
-        # If not in environment, try to load from config file
-        if not client_id or not client_secret:
-            config_file = resource_path("oauth_config.json")
-            if os.path.exists(config_file):
-                import json
-                with open(config_file, 'r') as f:
-                    config = json.load(f)
-                client_id = config.get("client_id")
-                client_secret = config.get("client_secret")
-        
-        if not client_id or not client_secret:
-            raise Exception("OAuth credentials not found. Please set GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET environment variables or provide oauth_config.json file.")
-        
-        client_config = {
-            "installed": {
-                "client_id": client_id,
-                "project_id": "dataautomation-464320", 
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-                "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                "client_secret": client_secret,
-                "redirect_uris": ["http://localhost"]
-            }
-        }
-        
-        # For token.json, we need to save it to a writable location
-        # Use the user's home directory for persistent storage
-        home_dir = os.path.expanduser("~")
-        token_file = os.path.join(home_dir, '.google_fit_token.json')
-
-        creds = None
-        if os.path.exists(token_file):
-            creds = Credentials.from_authorized_user_file(token_file, SCOPES)
-
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
-                # Try multiple ports to avoid conflicts
-                for port in [8080, 8081, 8082, 8083, 0]:  # 0 = any available port
-                    try:
-                        creds = flow.run_local_server(port=port)
-                        break
-                    except OSError as e:
-                        if port == 0:  # Last attempt with any port
-                            raise e
-                        continue
-            with open(token_file, 'w') as token:
-                token.write(creds.to_json())
-
-        fitness_service = build('fitness', 'v1', credentials=creds)
-
-        if historical:
-            start_date = datetime.datetime(2022, 1, 1)
-        else:
-            start_date = datetime.datetime.utcnow() - datetime.timedelta(days=1)
-
-        end_date = datetime.datetime.utcnow()
-        current = start_date
-        all_rows = []
-
-        while current < end_date:
-            next_month = current + datetime.timedelta(days=30)
-            start_time = int(current.timestamp() * 1000)
-            end_time = int(min(next_month, end_date).timestamp() * 1000)
-
-            body = {
-                "aggregateBy": [{
-                    "dataTypeName": "com.google.step_count.delta",
-                    "dataSourceId": "derived:com.google.step_count.delta:com.google.android.gms:estimated_steps"
-                }],
-                "bucketByTime": {"durationMillis": 86400000},
-                "startTimeMillis": start_time,
-                "endTimeMillis": end_time
-            }
-
-            response = fitness_service.users().dataset().aggregate(userId='me', body=body).execute()
-
-            for bucket in response['bucket']:
-                for dataset in bucket['dataset']:
-                    for point in dataset['point']:
-                        steps = point['value'][0]['intVal']
-                        start = datetime.datetime.fromtimestamp(int(point['startTimeNanos']) / 1e9)
-                        end = datetime.datetime.fromtimestamp(int(point['endTimeNanos']) / 1e9)
-                        all_rows.append({'start': start, 'end': end, 'steps': steps})
-
-            current = next_month
-
-        # Save output to user-accessible directory
-        if getattr(sys, 'frozen', False):
-            # When running as packaged app
-            if sys.platform == 'darwin' and sys.executable.endswith('.app/Contents/MacOS/GoogleFitSync'):
-                # On Mac, save next to the .app bundle, not inside it
-                app_path = sys.executable.replace('/Contents/MacOS/GoogleFitSync', '')
-                project_root = os.path.dirname(app_path)
-            else:
-                # On Windows/Linux, save next to executable
-                project_root = os.path.dirname(sys.executable)
-        else:
-            # When running in development, use the script's directory
-            project_root = os.path.dirname(os.path.abspath(__file__))
-        
-        output_dir = os.path.join(project_root, "Steps", "Raw")
-        os.makedirs(output_dir, exist_ok=True)
+# When set to a file path, the app records start-up timings there and quits
+# (see benchmark_startup.py)
+STARTUP_BENCHMARK = os.getenv("GOOGLE_FIT_STARTUP_BENCHMARK")
+MAIN_IMPORTED_AT = time.time()
 
-        if historical:
-            output_file = os.path.join(output_dir, 'steps_data_full.csv')
-        else:
-            output_file = os.path.join(output_dir, 'steps_data_daily.csv')
+def load_engine():
+    """Import the sync engine, waiting for a background preload if one is running"""
+    import engine
+    return engine
 
-        pd.DataFrame(all_rows).to_csv(output_file, index=False)
-        
-        # Update status for user
-        result_label.config(text="Collecting health data... (this may take a few minutes)")
-        
-        # Collect ALL available health data with rate limiting
-        health_data = collect_all_health_data(fitness_service, start_date, end_date, project_root, historical)
-        
-        if historical:
-            result_label.config(text=f"✅ Full history saved!")
-            message = f"Steps data saved to: {output_file}"
-            messagebox.showinfo("Success", message)
-        else:
-            result_label.config(text=f"✅ Daily sync done!")
-            # Note: GUI-only mode, no console output
-
-    except Exception as e:
-        result_label.config(text=f"❌ Error: {e}")
-        messagebox.showerror("Error", f"Something went wrong:\n{e}")
+def preload_engine():
+    """Start importing the sync engine off the Tk thread so the first sync starts promptly"""
+    threading.Thread(target=load_engine, daemon=True).start()
 
-def collect_all_health_data(fitness_service, start_date, end_date, project_root, historical):
-    """Collect heart rate, weight, calories, and distance data"""
-    health_data = {}
-    
-    # Data source configurations for comprehensive health data
-    data_sources = {
-        'calories': {
-            'dataTypeName': 'com.google.calories.expended',
-            'folder': 'Calories'
-        },
-        'distance': {
-            'dataTypeName': 'com.google.distance.delta',
-            'folder': 'Distance'
-        },
-        'heart_rate': {
-            'dataTypeName': 'com.google.heart_rate.bpm',
-            'folder': 'HeartRate'
-        },
-        'weight': {
-            'dataTypeName': 'com.google.weight',
-            'folder': 'Weight'
-        },
-        'height': {
-            'dataTypeName': 'com.google.height',
-            'folder': 'Height'
-        },
-        'body_fat': {
-            'dataTypeName': 'com.google.body.fat.percentage',
-            'folder': 'BodyFat'
-        },
-        'blood_pressure': {
-            'dataTypeName': 'com.google.blood_pressure',
-            'folder': 'BloodPressure'
-        },
-        'blood_glucose': {
-            'dataTypeName': 'com.google.blood_glucose',
-            'folder': 'BloodGlucose'
-        },
-        'oxygen_saturation': {
-            'dataTypeName': 'com.google.oxygen_saturation',
-            'folder': 'OxygenSaturation'
-        },
-        'body_temperature': {
-            'dataTypeName': 'com.google.body.temperature',
-            'folder': 'BodyTemperature'
-        },
-        'sleep': {
-            'dataTypeName': 'com.google.sleep.segment',
-            'folder': 'Sleep'
-        },
-        'reproductive_health': {
-            'dataTypeName': 'com.google.menstruation',
-            'folder': 'ReproductiveHealth'
-        }
-    }
-    
-    for i, (data_type, config) in enumerate(data_sources.items()):
-        try:
-            result_label.config(text=f"Collecting {data_type} data... ({i+1}/{len(data_sources)})")
-            rows = []
-            current = start_date
-            
-            while current < end_date:
-                next_month = current + datetime.timedelta(days=30)
-                start_time = int(current.timestamp() * 1000)
-                end_time = int(min(next_month, end_date).timestamp() * 1000)
-                
-                body = {
-                    "aggregateBy": [{
-                        "dataTypeName": config['dataTypeName']
-                    }],
-                    "bucketByTime": {"durationMillis": 86400000},
-                    "startTimeMillis": start_time,
-                    "endTimeMillis": end_time
-                }
-                
-                try:
-                    # Shorter delay - 1 second should be enough
-                    sleep(1)  # 1 second delay between API calls
-                    result_label.config(text=f"Collecting {data_type} data... ({i+1}/{len(data_sources)}) - {current.strftime('%Y-%m')}")
-                    response = fitness_service.users().dataset().aggregate(userId='me', body=body).execute()
-                    
-                    for bucket in response['bucket']:
-                        for dataset in bucket['dataset']:
-                            for point in dataset['point']:
-                                start_dt = datetime.datetime.fromtimestamp(int(point['startTimeNanos']) / 1e9)
-                                end_dt = datetime.datetime.fromtimestamp(int(point['endTimeNanos']) / 1e9)
-                                
-                                if data_type == 'heart_rate':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'heart_rate_bpm': value})
-                                elif data_type == 'weight':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'weight_kg': value})
-                                elif data_type == 'calories':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'calories': value})
-                                elif data_type == 'distance':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'distance_meters': value})
-                                elif data_type == 'height':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'height_meters': value})
-                                elif data_type == 'body_fat':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'body_fat_percentage': value})
-                                elif data_type == 'blood_pressure':
-                                    systolic = point['value'][0]['fpVal'] if point['value'] else 0
-                                    diastolic = point['value'][1]['fpVal'] if len(point['value']) > 1 else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'systolic_mmHg': systolic, 'diastolic_mmHg': diastolic})
-                                elif data_type == 'blood_glucose':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'glucose_mmol_per_L': value})
-                                elif data_type == 'oxygen_saturation':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'oxygen_saturation_percentage': value})
-                                elif data_type == 'body_temperature':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'temperature_celsius': value})
-                                elif data_type == 'sleep':
-                                    value = point['value'][0]['intVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'sleep_type': value})
-                                elif data_type == 'reproductive_health':
-                                    value = point['value'][0]['intVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'menstruation_flow': value})
-                                
-                except Exception as e:
-                    # Handle rate limiting and other errors
-                    if "rateLimitExceeded" in str(e) or "429" in str(e):
-                        result_label.config(text=f"Rate limit hit for {data_type}, waiting 30 seconds...")
-                        sleep(30)  # Shorter wait - 30 seconds instead of 60
-                        continue  # Retry the same request
-                    elif "Invalid scope" in str(e) or "forbidden" in str(e).lower():
-                        result_label.config(text=f"Skipping {data_type} (not available)")
-                        sleep(0.5)
-                        break  # Skip this data type entirely
-                    else:
-                        # Other errors - data might not be available
-                        result_label.config(text=f"No {data_type} data found")
-                        sleep(0.5)
-                        break  # Skip this data type
-                    
-                current = next_month
-            
-            # Save data if we have any
-            if rows:
-                output_dir = os.path.join(project_root, config['folder'], "Raw")
-                os.makedirs(output_dir, exist_ok=True)
-                
-                if historical:
-                    output_file = os.path.join(output_dir, f'{data_type}_data_full.csv')
-                else:
-                    output_file = os.path.join(output_dir, f'{data_type}_data_daily.csv')
-                
-                pd.DataFrame(rows).to_csv(output_file, index=False)
-                health_data[data_type] = output_file
-                result_label.config(text=f"✅ {data_type} saved ({len(rows)} records)")
-                sleep(0.5)  # Brief pause to show success
-            else:
-                health_data[data_type] = None
-                result_label.config(text=f"⚠️ No {data_type} data found")
-                sleep(0.5)
-                
-        except Exception:
-            health_data[data_type] = None
-    
-    return health_data
+def run_sync_with_selection(selected_data_types, historical=False, job=None):
+    """Run sync with only selected data types"""
+    return load_engine().run_sync_with_selection(selected_data_types, historical=historical, job=job)
 
 def start_sync():
     # Get selected data types
@@ -353,307 +48,167 @@ def start_sync():
         messagebox.showwarning("Warning", "Please select at least one data type to import.")
         return
     
-    result_label.config(text="Starting import...")
-    threading.Thread(target=lambda: run_sync_with_selection(selected_data_types, historical=True)).start()
+    job, created = job_manager.submit(SYNC_ACCOUNT, selected_data_types, historical=True,
+                                      budget_seconds=HISTORICAL_BUDGET_SECONDS)
+    if not created:
+        progress.emit('status', f"Import already running (job {job.id})")
+        return
+    waiting_for = job.to_dict()['waiting_for']
+    if waiting_for:
+        progress.emit('status', f"Import queued until job {', '.join(map(str, waiting_for))} finishes")
+    else:
+        progress.emit('status', "Starting import...")
+
+    # One daily loop per app; later presses just change what it syncs
+    global periodic_selection
+    started = periodic_selection is not None
+    periodic_selection = selected_data_types
+    if started:
+        return
 
     def periodic_sync():
         while True:
             time.sleep(86400)
-            run_sync_with_selection(selected_data_types, historical=False)
+            job_manager.submit(SYNC_ACCOUNT, periodic_selection, historical=False,
+                               budget_seconds=DAILY_BUDGET_SECONDS)
 
     threading.Thread(target=periodic_sync, daemon=True).start()
 
-def run_sync_with_selection(selected_data_types, historical=False):
-    """Run sync with only selected data types"""
-    try:
-        # Get executable directory for save location  
-        if getattr(sys, 'frozen', False):
-            if sys.platform == 'darwin' and sys.executable.endswith('.app/Contents/MacOS/GoogleFitSync'):
-                app_path = sys.executable.replace('/Contents/MacOS/GoogleFitSync', '')
-                project_root = os.path.dirname(app_path)
-            else:
-                project_root = os.path.dirname(sys.executable)
-        else:
-            project_root = os.path.dirname(os.path.abspath(__file__))
-        
-        # OAuth setup (same as before)
-        client_id = os.getenv("GOOGLE_CLIENT_ID")
-        client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
-        
-        if not client_id or not client_secret:
-            config_file = resource_path("oauth_config.json")
-            if os.path.exists(config_file):
-                import json
-                with open(config_file, 'r') as f:
-                    config = json.load(f)
-                client_id = config.get("client_id")
-                client_secret = config.get("client_secret")
-        
-        if not client_id or not client_secret:
-            raise Exception("OAuth credentials not found.")
-        
-        client_config = {
-            "installed": {
-                "client_id": client_id,
-                "project_id": "dataautomation-464320",
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-                "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                "client_secret": client_secret,
-                "redirect_uris": ["http://localhost"]
-            }
-        }
-        
-        home_dir = os.path.expanduser("~")
-        token_file = os.path.join(home_dir, '.google_fit_token.json')
-
-        creds = None
-        if os.path.exists(token_file):
-            creds = Credentials.from_authorized_user_file(token_file, SCOPES)
-
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
-                for port in [8080, 8081, 8082, 8083, 0]:
-                    try:
-                        creds = flow.run_local_server(port=port)
-                        break
-                    except OSError as e:
-                        if port == 0:
-                            raise e
-                        continue
-            with open(token_file, 'w') as token:
-                token.write(creds.to_json())
-
-        fitness_service = build('fitness', 'v1', credentials=creds)
-
-        if historical:
-            start_date = datetime.datetime(2022, 1, 1)
-        else:
-            start_date = datetime.datetime.utcnow() - datetime.timedelta(days=1)
-
-        end_date = datetime.datetime.utcnow()
-        
-        # Collect selected data types
-        saved_files = []
-        
-        # Handle steps separately if selected
-        if 'steps' in selected_data_types:
-            steps_file = collect_steps_data(fitness_service, start_date, end_date, project_root, historical)
-            if steps_file:
-                saved_files.append(steps_file)
-        
-        # Handle other health data if selected
-        other_data_types = [dt for dt in selected_data_types if dt != 'steps']
-        if other_data_types:
-            health_data = collect_selected_health_data(fitness_service, start_date, end_date, project_root, historical, other_data_types)
-            saved_files.extend([f for f in health_data.values() if f])
-        
-        # Show final results
-        if saved_files:
-            folder_name = os.path.basename(project_root)
-            result_text = f"✅ Data saved in '{folder_name}' folder ({len(saved_files)} files created)"
-            if historical:
-                messagebox.showinfo("Success", result_text)
-        else:
-            result_text = "⚠️ No data was available for the selected types"
-            
-        result_label.config(text=result_text)
-            
-    except Exception as e:
-        result_label.config(text=f"❌ Error: {e}")
-        messagebox.showerror("Error", f"Something went wrong:\n{e}")
-
-def collect_steps_data(fitness_service, start_date, end_date, project_root, historical):
-    """Collect steps data specifically"""
-    try:
-        current = start_date
-        all_rows = []
-        total_months = ((end_date.year - start_date.year) * 12 + (end_date.month - start_date.month))
-        month_count = 0
-
-        while current < end_date:
-            month_count += 1
-            next_month = current + datetime.timedelta(days=30)
-            start_time = int(current.timestamp() * 1000)
-            end_time = int(min(next_month, end_date).timestamp() * 1000)
-            
-            result_label.config(text=f"Collecting steps data... ({month_count}/{total_months}) - {current.strftime('%Y-%m')}")
-            
-            body = {
-                "aggregateBy": [{
-                    "dataTypeName": "com.google.step_count.delta",
-                    "dataSourceId": "derived:com.google.step_count.delta:com.google.android.gms:estimated_steps"
-                }],
-                "bucketByTime": {"durationMillis": 86400000},
-                "startTimeMillis": start_time,
-                "endTimeMillis": end_time
-            }
-
-            sleep(1)  # Rate limiting
-            response = fitness_service.users().dataset().aggregate(userId='me', body=body).execute()
-
-            for bucket in response['bucket']:
-                for dataset in bucket['dataset']:
-                    for point in dataset['point']:
-                        steps = point['value'][0]['intVal']
-                        start = datetime.datetime.fromtimestamp(int(point['startTimeNanos']) / 1e9)
-                        end = datetime.datetime.fromtimestamp(int(point['endTimeNanos']) / 1e9)
-                        all_rows.append({'start': start, 'end': end, 'steps': steps})
-
-            current = next_month
-
-        # Save steps data
-        if all_rows:
-            output_dir = os.path.join(project_root, "Steps", "Raw")
-            os.makedirs(output_dir, exist_ok=True)
-            
-            if historical:
-                output_file = os.path.join(output_dir, 'steps_data_full.csv')
-            else:
-                output_file = os.path.join(output_dir, 'steps_data_daily.csv')
-            
-            pd.DataFrame(all_rows).to_csv(output_file, index=False)
-            result_label.config(text=f"✅ Steps saved ({len(all_rows)} records)")
-            sleep(0.5)
-            return output_file
-        else:
-            result_label.config(text="⚠️ No steps data found")
-            sleep(0.5)
-            return None
-            
-    except Exception as e:
-        result_label.config(text=f"⚠️ Steps data error: {str(e)[:50]}...")
-        sleep(0.5)
-        return None
-
-def collect_selected_health_data(fitness_service, start_date, end_date, project_root, historical, selected_types):
-    """Collect only selected health data types"""
-    health_data = {}
-    
-    # All data source configurations for comprehensive health data
-    all_data_sources = {
-        'calories': {'dataTypeName': 'com.google.calories.expended', 'folder': 'Calories'},
-        'distance': {'dataTypeName': 'com.google.distance.delta', 'folder': 'Distance'},
-        'heart_rate': {'dataTypeName': 'com.google.heart_rate.bpm', 'folder': 'HeartRate'},
-        'weight': {'dataTypeName': 'com.google.weight', 'folder': 'Weight'},
-        'height': {'dataTypeName': 'com.google.height', 'folder': 'Height'},
-        'body_fat': {'dataTypeName': 'com.google.body.fat.percentage', 'folder': 'BodyFat'},
-        'blood_pressure': {'dataTypeName': 'com.google.blood_pressure', 'folder': 'BloodPressure'},
-        'blood_glucose': {'dataTypeName': 'com.google.blood_glucose', 'folder': 'BloodGlucose'},
-        'oxygen_saturation': {'dataTypeName': 'com.google.oxygen_saturation', 'folder': 'OxygenSaturation'},
-        'body_temperature': {'dataTypeName': 'com.google.body.temperature', 'folder': 'BodyTemperature'},
-        'sleep': {'dataTypeName': 'com.google.sleep.segment', 'folder': 'Sleep'},
-        'reproductive_health': {'dataTypeName': 'com.google.menstruation', 'folder': 'ReproductiveHealth'}
-    }
-    
-    # Filter to only selected data sources
-    data_sources = {k: v for k, v in all_data_sources.items() if k in selected_types}
-    
-    # Use the existing collect_all_health_data logic but with filtered sources
-    return collect_filtered_health_data(fitness_service, start_date, end_date, project_root, historical, data_sources)
+def cancel_sync():
+    """Ask every running sync to stop after its current window"""
+    if job_manager.cancel():
+        progress.emit('status', "Cancelling... (finishing current request)")
+    else:
+        progress.emit('status', "No sync is running")
+
+def poll_progress():
+    """Apply queued progress events to the GUI; runs on the Tk thread"""
+    events = progress.drain()
+    # A plan is shown in its own dialog rather than the status line
+    status_events = [event for event in events if event['kind'] != 'plan_ready']
+    if status_events:
+        result_label.config(text=progress.latest_status(status_events))
+    for event in events:
+        if event['kind'] in ('plan_ready', 'plan_failed'):
+            preview_button.config(state='normal')
+        if event['kind'] == 'plan_ready':
+            messagebox.showinfo("Import Preview", event['message'])
+        elif event['dialog'] and event['kind'] == 'sync_failed':
+            messagebox.showerror("Error", f"Something went wrong:\n{event['error']}")
+        elif event['dialog']:
+            messagebox.showinfo("Success", event['message'])
+    jobs_text = jobs.describe(job_manager.status())
+    if jobs_label.cget('text') != jobs_text:
+        jobs_label.config(text=jobs_text)
+    root.after(100, poll_progress)
+
+def plan_selection(selected_data_types, historical):
+    """Request plan for syncing selected_data_types now, checked against the time and quota budgets"""
+    engine = load_engine()
+    import planner
+    budget = HISTORICAL_BUDGET_SECONDS if historical else DAILY_BUDGET_SECONDS
+    return planner, planner.plan_sync(engine.get_project_root(), selected_data_types, historical=historical,
+                                      time_budget_seconds=budget)
+
+def preview_sync():
+    """Show how many requests and how long an import of the selected types would take"""
+    selected_data_types = [data_type for data_type, var in checkbox_vars.items() if var.get()]
+    if not selected_data_types:
+        messagebox.showwarning("Warning", "Please select at least one data type to import.")
+        return
+    # Planning imports the engine, which may still be loading; keep it off the Tk thread
+    preview_button.config(state='disabled')
+    progress.emit('status', "Planning requests...")
 
-def collect_filtered_health_data(fitness_service, start_date, end_date, project_root, historical, data_sources):
-    """Modified version of collect_all_health_data for selected data types only"""
-    health_data = {}
-    
-    for i, (data_type, config) in enumerate(data_sources.items()):
+    def build_plan():
         try:
-            result_label.config(text=f"Collecting {data_type} data... ({i+1}/{len(data_sources)})")
-            rows = []
-            current = start_date
-            
-            while current < end_date:
-                next_month = current + datetime.timedelta(days=30)
-                start_time = int(current.timestamp() * 1000)
-                end_time = int(min(next_month, end_date).timestamp() * 1000)
-                
-                body = {
-                    "aggregateBy": [{
-                        "dataTypeName": config['dataTypeName']
-                    }],
-                    "bucketByTime": {"durationMillis": 86400000},
-                    "startTimeMillis": start_time,
-                    "endTimeMillis": end_time
-                }
-                
-                try:
-                    sleep(1)
-                    result_label.config(text=f"Collecting {data_type} data... ({i+1}/{len(data_sources)}) - {current.strftime('%Y-%m')}")
-                    response = fitness_service.users().dataset().aggregate(userId='me', body=body).execute()
-                    
-                    for bucket in response['bucket']:
-                        for dataset in bucket['dataset']:
-                            for point in dataset['point']:
-                                start_dt = datetime.datetime.fromtimestamp(int(point['startTimeNanos']) / 1e9)
-                                end_dt = datetime.datetime.fromtimestamp(int(point['endTimeNanos']) / 1e9)
-                                
-                                # Data type specific parsing for confirmed working data types
-                                if data_type == 'heart_rate':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'heart_rate_bpm': value})
-                                elif data_type == 'weight':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'weight_kg': value})
-                                elif data_type == 'calories':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'calories': value})
-                                elif data_type == 'distance':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'distance_meters': value})
-                                elif data_type == 'height':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'height_meters': value})
-                                elif data_type == 'body_fat':
-                                    value = point['value'][0]['fpVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'body_fat_percentage': value})
-                                elif data_type == 'sleep':
-                                    value = point['value'][0]['intVal'] if point['value'] else 0
-                                    rows.append({'start': start_dt, 'end': end_dt, 'sleep_type': value})
-                                
-                except Exception as e:
-                    if "rateLimitExceeded" in str(e) or "429" in str(e):
-                        result_label.config(text=f"Rate limit hit for {data_type}, waiting 30 seconds...")
-                        sleep(30)
-                        continue
-                    elif "Invalid scope" in str(e) or "forbidden" in str(e).lower():
-                        result_label.config(text=f"Skipping {data_type} (not available)")
-                        sleep(0.5)
-                        break
-                    else:
-                        result_label.config(text=f"No {data_type} data found")
-                        sleep(0.5)
-                        break
-                    
-                current = next_month
-            
-            # Save data if we have any
-            if rows:
-                output_dir = os.path.join(project_root, config['folder'], "Raw")
-                os.makedirs(output_dir, exist_ok=True)
-                
-                if historical:
-                    output_file = os.path.join(output_dir, f'{data_type}_data_full.csv')
-                else:
-                    output_file = os.path.join(output_dir, f'{data_type}_data_daily.csv')
-                
-                pd.DataFrame(rows).to_csv(output_file, index=False)
-                health_data[data_type] = output_file
-                result_label.config(text=f"✅ {data_type} saved ({len(rows)} records)")
-                sleep(0.5)
-            else:
-                health_data[data_type] = None
-                result_label.config(text=f"⚠️ No {data_type} data found")
-                sleep(0.5)
-                
-        except Exception:
-            health_data[data_type] = None
-    
-    return health_data
+            planner, plan = plan_selection(selected_data_types, historical=True)
+            progress.emit('status', "📋 Import preview ready")
+            progress.emit('plan_ready', planner.format_plan(plan))
+        except Exception as e:
+            progress.emit('plan_failed', f"❌ Could not plan the import: {e}", error=str(e))
+
+    threading.Thread(target=build_plan, daemon=True).start()
+
+def run_headless(historical=False, retry_failed=False, fill_missing=False, plan_only=False):
+    """Sync every data type without the GUI, logging progress events
+
+    With plan_only the request plan is printed instead, and the return value
+    says whether it fits the quota budget. A sync whose plan is over
+    GOOGLE_FIT_QUOTA_BUDGET is not started.
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    progress.use_logging()
+    if retry_failed:
+        load_engine().retry_failed_windows([key for key, _ in DATA_TYPES])
+        return True
+    if fill_missing:
+        load_engine().fill_gaps([key for key, _ in DATA_TYPES])
+        return True
+    if plan_only or os.getenv("GOOGLE_FIT_QUOTA_BUDGET"):
+        planner, plan = plan_selection([key for key, _ in DATA_TYPES], historical)
+        if plan_only:
+            print(planner.format_plan(plan))
+            return plan['within_quota_budget']
+        if not plan['within_quota_budget']:
+            progress.emit('sync_failed', f"❌ Sync needs {plan['quota_use']} calls, over the quota budget of {plan['quota_budget']}",
+                          error="quota budget exceeded")
+            return False
+    budget = HISTORICAL_BUDGET_SECONDS if historical else DAILY_BUDGET_SECONDS
+    job, _ = job_manager.submit(SYNC_ACCOUNT, [key for key, _ in DATA_TYPES], historical, budget_seconds=budget)
+    while job.status in jobs.ACTIVE:
+        time.sleep(1)
+    return job.status == 'done'
+
+def run_startup_benchmark(path):
+    """Record when the window is drawn and when the first request is ready, then quit
+
+    The first request is built exactly as a sync would build it, but without
+    OAuth or the network round trip, so the timing covers unpacking, imports and
+    API discovery only.
+    """
+    marks = {'main_imported': MAIN_IMPORTED_AT}
+
+    def build_first_request():
+        try:
+            load_engine().first_request_for_benchmark()
+            marks['first_request'] = time.time()
+        except Exception as e:
+            marks['error'] = str(e)
+
+    def window_mapped(event):
+        if event.widget is root and 'window' not in marks:
+            marks['window'] = time.time()
+            worker = threading.Thread(target=build_first_request, daemon=True)
+            worker.start()
+            root.after(50, finish, worker)
+
+    def finish(worker):
+        if worker.is_alive():
+            root.after(50, finish, worker)
+            return
+        with open(path, 'w') as f:
+            json.dump(marks, f)
+        root.destroy()
+
+    root.bind('<Map>', window_mapped, add='+')
+
+# All syncs go through one manager so duplicate and overlapping requests don't collide
+job_manager = jobs.JobManager(run_sync_with_selection)
+periodic_selection = None
 
 if __name__ == '__main__':
+    # Lets the packaged app start the derived-metrics process pool
+    multiprocessing.freeze_support()
+    if '--headless' in sys.argv:
+        if '--plan' in sys.argv:
+            # Exit status says whether the plan fits GOOGLE_FIT_QUOTA_BUDGET
+            sys.exit(0 if run_headless(historical='--daily' not in sys.argv, plan_only=True) else 1)
+        # Exit status 1 when the sync failed, was stopped or was over the quota budget
+        ok = run_headless(historical='--daily' not in sys.argv, retry_failed='--retry-failed' in sys.argv,
+                          fill_missing='--fill-gaps' in sys.argv)
+        sys.exit(0 if ok else 1)
+
     root = Tk()
     root.title("Google Fit Data Sync")
     root.geometry("600x700")
@@ -682,21 +237,6 @@ if __name__ == '__main__':
     
     # Data type selection
     checkbox_vars = {}
-    data_types = [
-        ('steps', 'Steps (daily step count)'),
-        ('calories', 'Calories (burned calories)'),
-        ('distance', 'Distance (traveled distance)'),
-        ('heart_rate', 'Heart Rate (BPM measurements)'),
-        ('weight', 'Weight (body weight)'),
-        ('height', 'Height (body height)'),
-        ('body_fat', 'Body Fat (body fat percentage)'),
-        ('blood_pressure', 'Blood Pressure (systolic/diastolic)'),
-        ('blood_glucose', 'Blood Glucose (glucose levels)'),
-        ('oxygen_saturation', 'Oxygen Saturation (O2 levels)'),
-        ('body_temperature', 'Body Temperature (temperature)'),
-        ('sleep', 'Sleep (sleep segments)'),
-        ('reproductive_health', 'Reproductive Health (menstruation)')
-    ]
     
     # Select All checkbox
     def select_all():
@@ -734,7 +274,7 @@ if __name__ == '__main__':
     canvas.configure(yscrollcommand=scrollbar.set)
     
     # Create checkboxes for each data type
-    for data_key, data_desc in data_types:
+    for data_key, data_desc in DATA_TYPES:
         var = IntVar(value=1)  # Default to selected
         checkbox_vars[data_key] = var
         
@@ -775,11 +315,39 @@ if __name__ == '__main__':
                          relief='flat')
     start_button.pack(pady=(0, 10))
     
+    # Cancel button
+    cancel_button = Button(bottom_frame, 
+                          text="⏹ Cancel Running Sync", 
+                          command=cancel_sync, 
+                          font=("Helvetica", 10),
+                          fg='black', relief='flat')
+    cancel_button.pack(pady=(0, 5))
+    
+    # Preview button
+    preview_button = Button(bottom_frame, 
+                           text="📋 Preview Requests", 
+                           command=preview_sync, 
+                           font=("Helvetica", 10),
+                           fg='black', relief='flat')
+    preview_button.pack(pady=(0, 5))
+    
     # Result label
     result_label = Label(bottom_frame, text="", 
                         font=("Helvetica", 11), 
                         bg='#f0f0f0', fg='#27ae60',
                         wraplength=550)
     result_label.pack(pady=10)
+
+    # Job status readout
+    jobs_label = Label(bottom_frame, text="", 
+                      font=("Helvetica", 9), 
+                      bg='#f0f0f0', fg='#7f8c8d',
+                      wraplength=550)
+    jobs_label.pack(pady=(0, 5))
     
+    root.after(100, poll_progress)
+    if STARTUP_BENCHMARK:
+        run_startup_benchmark(STARTUP_BENCHMARK)
+    else:
+        root.after_idle(preload_engine)
     root.mainloop()
@@ -0,0 +1,285 @@
+"""
+Derived daily metrics computed from synced samples.
+
+    resting_heart_rate  HeartRate/Processed/resting_heart_rate_daily.csv
+    heart_rate_zones    HeartRate/Processed/heart_rate_zones_daily.csv
+    sleep_stages        Sleep/Processed/sleep_stages_daily.csv
+    step_cadence        Steps/Processed/step_cadence_daily.csv
+
+The history is split into month (or day) chunks. Each chunk is passed as
+plain arrays to a NumPy kernel running on a process pool. After a sync only
+the days touched by the new rows are recomputed and spliced into the existing
+files, as with the rollups. `python metrics.py` rebuilds every file.
+
+The kernels work at whatever resolution is stored. Resting heart rate, zone
+minutes and cadence need sub-daily samples, so daily aggregate buckets, being
+longer than MAX_SAMPLE_SECONDS, are left out of them.
+
+    GOOGLE_FIT_MAX_HR=190             maximum heart rate the zones are based on
+    GOOGLE_FIT_METRICS_WORKERS=4      processes in the pool (default: CPU count)
+"""
+
+import argparse
+import datetime
+import functools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import rollups
+import store
+import writers
+from datatypes import DATA_SOURCES
+
+# NumPy datetime unit for each chunk size
+CHUNKS = {'day': 'D', 'month': 'M'}
+
+# Below this many rows starting a process pool costs more than it saves
+MIN_PARALLEL_ROWS = 500000
+
+# Longest sample counted towards resting heart rate, zone minutes and cadence
+MAX_SAMPLE_SECONDS = 15 * 60
+
+# Resting heart rate is this percentile of the day's samples
+RESTING_PERCENTILE = 10
+
+# Lower bound of heart rate zones 1-5 as a fraction of maximum heart rate
+ZONE_BOUNDS = (0.5, 0.6, 0.7, 0.8, 0.9)
+DEFAULT_MAX_HR = 190
+
+# Google Fit sleep segment types
+SLEEP_STAGES = {1: 'awake', 2: 'sleep', 3: 'out_of_bed', 4: 'light', 5: 'deep', 6: 'rem'}
+
+# Steps per minute above which a sample counts as walking
+WALKING_CADENCE = 60
+
+
+def group_days(day):
+    """Unique days, index of each day's first element and element counts for a day-sorted array"""
+    first = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    counts = np.diff(np.r_[first, len(day)])
+    return day[first], first, counts
+
+
+def resting_heart_rate(day, start, end, bpm):
+    order = np.argsort(start, kind='stable')
+    counted = sample_seconds(start[order], end[order]) <= MAX_SAMPLE_SECONDS
+    # A daily bucket's value is the day's mean, which says nothing about rest
+    day, bpm = day[order][counted], bpm[order][counted]
+    if not len(day):
+        return day, {}
+    order = np.lexsort((bpm, day))
+    day, bpm = day[order], bpm[order]
+    days, first, counts = group_days(day)
+    resting = bpm[first + (RESTING_PERCENTILE * (counts - 1)) // 100]
+    return days, {
+        'resting_heart_rate_bpm': resting,
+        'min_bpm': bpm[first],
+        'mean_bpm': np.add.reduceat(bpm, first) / counts,
+        'samples': counts
+    }
+
+
+def sample_seconds(start, end):
+    """Duration of each sample, using the gap to the next one for instantaneous readings"""
+    seconds = end - start
+    gaps = np.diff(start, append=start[-1])
+    instant = seconds <= 0
+    seconds[instant] = np.minimum(gaps[instant], MAX_SAMPLE_SECONDS)
+    return seconds
+
+
+def heart_rate_zones(day, start, end, bpm, max_hr=DEFAULT_MAX_HR):
+    order = np.argsort(start, kind='stable')
+    day, start, end, bpm = day[order], start[order], end[order], bpm[order]
+    seconds = sample_seconds(start, end)
+    counted = seconds <= MAX_SAMPLE_SECONDS
+
+    days, day_index = np.unique(day[counted], return_inverse=True)
+    zone = np.searchsorted(np.array(ZONE_BOUNDS) * max_hr, bpm[counted], side='right')
+    slots = len(ZONE_BOUNDS) + 1
+    minutes = np.bincount(day_index * slots + zone, weights=seconds[counted] / 60,
+                          minlength=len(days) * slots).reshape(len(days), slots)
+
+    columns = {'below_zones_minutes': minutes[:, 0]}
+    for i in range(1, slots):
+        columns[f'zone_{i}_minutes'] = minutes[:, i]
+    return days, columns
+
+
+def sleep_stages(day, start, end, stage):
+    days, day_index = np.unique(day, return_inverse=True)
+    stage = np.where(np.isin(stage, list(SLEEP_STAGES)), stage, 0).astype(np.int64)
+    slots = max(SLEEP_STAGES) + 1
+    minutes = np.bincount(day_index * slots + stage, weights=(end - start) / 60,
+                          minlength=len(days) * slots).reshape(len(days), slots)
+
+    columns = {f'{name}_minutes': minutes[:, code] for code, name in SLEEP_STAGES.items()}
+    asleep = [code for code in SLEEP_STAGES if code not in rollups.NOT_ASLEEP]
+    columns['asleep_minutes'] = minutes[:, asleep].sum(axis=1)
+    columns['segments'] = np.bincount(day_index, minlength=len(days))
+    return days, columns
+
+
+def step_cadence(day, start, end, steps):
+    days, day_index = np.unique(day, return_inverse=True)
+    seconds = end - start
+    counted = (seconds > 0) & (seconds <= MAX_SAMPLE_SECONDS)
+    cadence = np.zeros_like(steps)
+    cadence[counted] = steps[counted] / (seconds[counted] / 60)
+    walking = counted & (cadence >= WALKING_CADENCE)
+
+    walking_minutes = np.bincount(day_index[walking], weights=seconds[walking] / 60, minlength=len(days))
+    walking_steps = np.bincount(day_index[walking], weights=steps[walking], minlength=len(days))
+    peak = np.full(len(days), np.nan)
+    np.fmax.at(peak, day_index[counted], cadence[counted])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        walking_cadence = np.where(walking_minutes > 0, walking_steps / walking_minutes, np.nan)
+
+    return days, {
+        'steps': np.bincount(day_index, weights=steps, minlength=len(days)),
+        'walking_minutes': walking_minutes,
+        'walking_cadence_spm': walking_cadence,
+        'peak_cadence_spm': peak
+    }
+
+
+def max_heart_rate():
+    return {'max_hr': float(os.getenv("GOOGLE_FIT_MAX_HR") or DEFAULT_MAX_HR)}
+
+
+# Source data type, value column and kernel for each metric. Rows are assigned
+# to the day of their 'day_from' timestamp; sleep counts towards the day you
+# wake up.
+METRICS = {
+    'resting_heart_rate': {'data_type': 'heart_rate', 'column': 'heart_rate_bpm', 'kernel': resting_heart_rate},
+    'heart_rate_zones': {'data_type': 'heart_rate', 'column': 'heart_rate_bpm', 'kernel': heart_rate_zones,
+                         'options': max_heart_rate},
+    'sleep_stages': {'data_type': 'sleep', 'column': 'sleep_type', 'kernel': sleep_stages, 'day_from': 'end'},
+    'step_cadence': {'data_type': 'steps', 'column': 'steps', 'kernel': step_cadence}
+}
+
+
+def metric_path(project_root, folder, name):
+    return os.path.join(project_root, folder, "Processed", f'{name}_daily.csv')
+
+
+def worker_count():
+    return int(os.getenv("GOOGLE_FIT_METRICS_WORKERS") or os.cpu_count() or 1)
+
+
+def attributed_days(frame, spec):
+    return frame[spec.get('day_from', 'start')].dt.normalize()
+
+
+def to_chunks(frame, spec, chunk):
+    """Split a frame into per-period (day, start, end, values) array tuples"""
+    day = attributed_days(frame, spec).values.astype('datetime64[D]')
+    start = frame['start'].values.astype('datetime64[ms]').astype(np.int64) / 1000
+    end = frame['end'].values.astype('datetime64[ms]').astype(np.int64) / 1000
+    values = frame[spec['column']].to_numpy(dtype=np.float64)
+
+    order = np.lexsort((start, day))
+    day, start, end, values = day[order], start[order], end[order], values[order]
+    period = day.astype(f'datetime64[{CHUNKS[chunk]}]')
+    bounds = np.flatnonzero(period[1:] != period[:-1]) + 1
+    return list(zip(*(np.split(a, bounds) for a in (day.astype(np.int64), start, end, values))))
+
+
+def compute_metric(frame, name, chunk='month', workers=None):
+    """Daily values of one metric for every day in frame"""
+    spec = METRICS[name]
+    kernel = spec['kernel']
+    if 'options' in spec:
+        kernel = functools.partial(kernel, **spec['options']())
+
+    frame = frame.dropna(subset=[spec['column']])
+    chunks = to_chunks(frame, spec, chunk) if len(frame) else []
+    workers = workers or worker_count()
+    if workers <= 1 or len(chunks) <= 1 or len(frame) < MIN_PARALLEL_ROWS:
+        results = [kernel(*c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(kernel, *zip(*chunks)))
+
+    parts = [pd.DataFrame({'date': days.astype('datetime64[D]'), **columns}) for days, columns in results if len(days)]
+    if not parts:
+        return pd.DataFrame()
+    result = pd.concat(parts, ignore_index=True)
+    result['date'] = result['date'].dt.strftime('%Y-%m-%d')
+    return result
+
+
+def update_metrics(project_root, folder, data_type, new_rows, db=None, workers=None):
+    """Recompute the days touched by new_rows for every metric of data_type; returns the files written"""
+    names = [name for name, spec in METRICS.items() if spec['data_type'] == data_type]
+    if not names or not new_rows:
+        return []
+
+    written = []
+    for name in names:
+        spec = METRICS[name]
+        touched = attributed_days(rollups.to_frame(new_rows), spec).unique()
+        # A day's rows can start the evening before it (sleep) or run into the next
+        start = min(touched) - pd.Timedelta(days=1)
+        end = max(touched) + pd.Timedelta(days=2)
+        base = rollups.load_base_rows(project_root, folder, data_type, new_rows, start, end, db)
+        base = base[attributed_days(base, spec).isin(touched)]
+        fresh = compute_metric(base, name, chunk='day', workers=workers)
+
+        path = metric_path(project_root, folder, name)
+        if os.path.exists(path):
+            existing = pd.read_csv(path, dtype={'date': str})
+            keep = existing[~existing['date'].isin(pd.DatetimeIndex(touched).strftime('%Y-%m-%d'))]
+            fresh = pd.concat([keep, fresh], ignore_index=True).sort_values('date')
+        if fresh.empty:
+            continue
+
+        writers.write_csv(fresh, path)
+        written.append(path)
+    return written
+
+
+def rebuild_metrics(project_root, db=None, chunk='month', workers=None):
+    """Recompute every metric over the whole stored history; returns the files written"""
+    written = []
+    for name, spec in METRICS.items():
+        folder = DATA_SOURCES[spec['data_type']]['folder']
+        base = rollups.load_base_rows(project_root, folder, spec['data_type'], [],
+                                      datetime.datetime(1970, 1, 1), datetime.datetime(9999, 1, 1), db)
+        if base.empty:
+            continue
+        result = compute_metric(base, name, chunk=chunk, workers=workers)
+        if result.empty:
+            continue
+        path = metric_path(project_root, folder, name)
+        writers.write_csv(result, path)
+        written.append(path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild derived daily metrics from synced Google Fit data")
+    parser.add_argument('--root', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="data folder containing the <Folder>/Raw outputs")
+    parser.add_argument('--db', default=os.getenv("GOOGLE_FIT_DB"),
+                        help="SQLite store written by the sync (relative to --root); defaults to the raw CSVs")
+    parser.add_argument('--chunk', choices=sorted(CHUNKS), default='month')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    db = store.open_store(os.path.join(args.root, args.db)) if args.db else None
+    try:
+        for path in rebuild_metrics(args.root, db=db, chunk=args.chunk, workers=args.workers):
+            logging.info("Wrote %s", path)
+    finally:
+        if db is not None:
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Request plan preview for a sync.
+
+Lists the aggregate windows a sync of the selected data types would request,
+using the engine's own window split and skipping windows a resumed backfill
+already has checkpointed. From that it estimates quota use and wall time
+under the engine's request pacing and rate-limit waits, and checks both
+against the configured budgets. Nothing is sent to Google.
+
+    GOOGLE_FIT_QUOTA_BUDGET=2000       aggregate calls one run may use
+    GOOGLE_FIT_QUOTA_PER_MINUTE=60     project rate limit to simulate (default: none)
+
+Errors, retries and data types Google refuses can't be predicted, so the
+estimate assumes every request succeeds first time unless it is rate limited.
+"""
+
+import collections
+import os
+
+import checkpoints
+import engine
+from datatypes import DATA_SOURCES
+
+# Typical round trip of one aggregate call, on top of the engine's pacing
+REQUEST_LATENCY_SECONDS = 0.5
+
+
+def env_int(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def simulate(requests, per_minute_limit=None, latency=REQUEST_LATENCY_SECONDS):
+    """(wall seconds, rate-limited calls) for sending requests the way the engine paces them"""
+    clock = 0.0
+    recent = collections.deque()
+    rate_limited = 0
+    for _ in range(requests):
+        while True:
+            clock += engine.REQUEST_DELAY_SECONDS
+            while recent and recent[0] <= clock - 60:
+                recent.popleft()
+            # A rejected call still uses quota
+            recent.append(clock)
+            clock += latency
+            if per_minute_limit is None or len(recent) <= per_minute_limit:
+                break
+            rate_limited += 1
+            clock += engine.RATE_LIMIT_WAIT_SECONDS
+    return clock, rate_limited
+
+
+def plan_type(project_root, data_type, start_date, end_date, historical):
+    """Windows one data type would request, marking the ones already checkpointed"""
+    done = checkpoints.done_windows(project_root, data_type, start_date) if historical else {}
+    windows = []
+    for window_start, window_end in engine.iter_windows(start_date, end_date):
+        start_time = int(window_start.timestamp() * 1000)
+        end_time = int(window_end.timestamp() * 1000)
+        windows.append({'start': window_start, 'end': window_end, 'cached': done.get(start_time) == end_time})
+    return {
+        'data_type': data_type,
+        'windows': windows,
+        'requests': sum(not w['cached'] for w in windows),
+        'cached': sum(w['cached'] for w in windows)
+    }
+
+
+def plan_sync(project_root, selected_data_types, start_date=None, end_date=None, historical=True,
+              quota_budget=None, per_minute_limit=None, time_budget_seconds=None, latency=REQUEST_LATENCY_SECONDS):
+    """Plan a sync without running it
+
+    start_date and end_date default to the range a sync started now would
+    use. quota_budget and per_minute_limit default to GOOGLE_FIT_QUOTA_BUDGET
+    and GOOGLE_FIT_QUOTA_PER_MINUTE.
+    """
+    unknown = [dt for dt in selected_data_types if dt not in DATA_SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown data types: {', '.join(unknown)}")
+    default_start, default_end = engine.sync_range(historical)
+    start_date = start_date or default_start
+    end_date = end_date or default_end
+    if start_date >= end_date:
+        raise ValueError("start must be before end")
+    if quota_budget is None:
+        quota_budget = env_int("GOOGLE_FIT_QUOTA_BUDGET")
+    if per_minute_limit is None:
+        per_minute_limit = env_int("GOOGLE_FIT_QUOTA_PER_MINUTE")
+
+    types = [plan_type(project_root, dt, start_date, end_date, historical)
+             for dt in engine.sync_order(selected_data_types)]
+    requests = sum(t['requests'] for t in types)
+    seconds, rate_limited = simulate(requests, per_minute_limit, latency)
+    quota_use = requests + rate_limited
+
+    return {
+        'start': start_date,
+        'end': end_date,
+        'historical': historical,
+        'types': types,
+        'requests': requests,
+        'cached_windows': sum(t['cached'] for t in types),
+        'rate_limited': rate_limited,
+        'quota_use': quota_use,
+        'estimated_seconds': seconds,
+        'quota_budget': quota_budget,
+        'within_quota_budget': quota_budget is None or quota_use <= quota_budget,
+        'time_budget_seconds': time_budget_seconds,
+        'within_time_budget': time_budget_seconds is None or seconds <= time_budget_seconds
+    }
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    return f"{minutes}m {seconds:02d}s"
+
+
+def format_plan(plan):
+    """Human-readable summary of a plan"""
+    lines = [f"📋 {plan['start']:%Y-%m-%d} to {plan['end']:%Y-%m-%d}"]
+    for t in plan['types']:
+        cached = f" ({t['cached']} windows already saved)" if t['cached'] else ""
+        lines.append(f"  {t['data_type']}: {t['requests']} request{'s' if t['requests'] != 1 else ''}{cached}")
+
+    waits = f", {plan['rate_limited']} rate-limit waits" if plan['rate_limited'] else ""
+    lines.append(f"Total: {plan['requests']} requests, ~{format_duration(plan['estimated_seconds'])}{waits}")
+    if plan['quota_budget'] is not None:
+        mark = "✅" if plan['within_quota_budget'] else "❌ over budget"
+        lines.append(f"Quota: {plan['quota_use']} of {plan['quota_budget']} calls {mark}")
+    if plan['time_budget_seconds'] is not None and not plan['within_time_budget']:
+        resume = " and resume on the next run" if plan['historical'] else ""
+        lines.append(f"⚠️ Longer than the {format_duration(plan['time_budget_seconds'])} time budget; "
+                     f"the sync will stop early{resume}")
+    return "\n".join(lines)
@@ -0,0 +1,77 @@
+"""
+Progress events for the sync engine.
+
+The collectors run on worker threads and must never touch Tk widgets, so they
+publish small event dicts here instead. The GUI drains the queue from its own
+thread with root.after(); headless runs switch the bus to logging mode.
+"""
+
+import logging
+import queue
+import time
+
+logger = logging.getLogger("google_fit_sync")
+
+# Event kinds that end a sync run
+FINAL_KINDS = ('sync_done', 'sync_failed', 'sync_cancelled')
+
+_events = queue.Queue()
+_log_only = False
+
+
+def use_logging(enabled=True):
+    """Log events as they are emitted instead of queueing them for a GUI"""
+    global _log_only
+    _log_only = enabled
+
+
+def emit(kind, message, data_type=None, window=None, rows=None, error=None, dialog=False):
+    """Publish a progress event without blocking the calling thread"""
+    event = {
+        'kind': kind,
+        'message': message,
+        'data_type': data_type,
+        'window': window,
+        'rows': rows,
+        'error': error,
+        'dialog': dialog,
+        'time': time.time()
+    }
+    if _log_only:
+        log_event(event)
+    else:
+        _events.put_nowait(event)
+    return event
+
+
+def drain():
+    """Return every event queued since the last call"""
+    events = []
+    while True:
+        try:
+            events.append(_events.get_nowait())
+        except queue.Empty:
+            return events
+
+
+def latest_status(events):
+    """Collapse a burst of events into the single status line worth showing"""
+    # A final event always wins so a fast run never hides its result
+    for event in reversed(events):
+        if event['kind'] in FINAL_KINDS:
+            return event['message']
+    return events[-1]['message'] if events else None
+
+
+def log_event(event):
+    """Write one event to the module logger"""
+    parts = [event['message']]
+    if event['window']:
+        start, end = event['window']
+        parts.append(f"window={start:%Y-%m-%d}..{end:%Y-%m-%d}")
+    if event['rows'] is not None:
+        parts.append(f"rows={event['rows']}")
+    if event['error']:
+        parts.append(f"error={event['error']}")
+    level = logging.ERROR if event['kind'] == 'sync_failed' else logging.INFO
+    logger.log(level, " | ".join(parts))
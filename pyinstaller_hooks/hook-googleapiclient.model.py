@@ -0,0 +1,9 @@
+# Fast-start build: replaces the stock googleapiclient hook, which bundles the
+# discovery documents of every Google API (~90 MB that a one-file build unpacks
+# on each launch). The app only calls the Fitness API.
+
+from PyInstaller.utils.hooks import collect_data_files, copy_metadata
+
+# googleapiclient.model reads the library version from its package metadata
+datas = copy_metadata('google_api_python_client')
+datas += collect_data_files('googleapiclient.discovery_cache', includes=['documents/fitness.v1.json'])
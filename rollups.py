@@ -0,0 +1,113 @@
+"""
+Weekly, monthly and yearly rollups for synced data types.
+
+Rollups live in <Folder>/Rollups/<data_type>_<period>.csv. After a sync only
+the periods touched by the new rows are recomputed from the raw data, then
+spliced into the existing rollup files.
+"""
+
+import os
+
+import pandas as pd
+
+import store
+import writers
+
+# pandas period alias for each rollup file
+PERIODS = {'weekly': 'W', 'monthly': 'M', 'yearly': 'Y'}
+
+# Aggregations per data type as {column: [functions]}
+ROLLUP_SPECS = {
+    'steps': {'steps': ['sum']},
+    'calories': {'calories': ['sum']},
+    'distance': {'distance_meters': ['sum']},
+    'heart_rate': {'heart_rate_bpm': ['min', 'max', 'mean']},
+    'weight': {'weight_kg': ['min', 'max', 'mean']},
+    'blood_glucose': {'glucose_mmol_per_L': ['min', 'max', 'mean']},
+    'sleep': {'sleep_minutes': ['sum']}
+}
+
+# Sleep segment types that are not time asleep (1 = awake, 3 = out of bed)
+NOT_ASLEEP = (1, 3)
+
+
+def rollup_path(project_root, folder, data_type, period):
+    return os.path.join(project_root, folder, "Rollups", f'{data_type}_{period}.csv')
+
+
+def to_frame(rows):
+    """Build a frame with parsed timestamps from row dicts"""
+    frame = pd.DataFrame(rows)
+    if frame.empty:
+        return frame
+    frame['start'] = pd.to_datetime(frame['start'])
+    frame['end'] = pd.to_datetime(frame['end'])
+    return frame
+
+
+def load_base_rows(project_root, folder, data_type, new_rows, start, end, db=None):
+    """All known rows with start in [start, end): the store if there is one, else the raw CSVs"""
+    if db is not None:
+        return to_frame(store.query_range(db, data_type, start, end))
+
+    frame = pd.DataFrame()
+    raw_dir = os.path.join(project_root, folder, "Raw")
+    # Daily syncs merge into the full export, so the daily file only fills in
+    # what an older full export lacks; new rows win over both
+    for name in (f'{data_type}_data_daily.csv', f'{data_type}_data_full.csv'):
+        path = writers.find_output(os.path.join(raw_dir, name))
+        if path:
+            frame = writers.replace_overlapping(frame, pd.read_csv(path, parse_dates=['start', 'end']))
+    frame = writers.replace_overlapping(frame, to_frame(new_rows))
+    if frame.empty:
+        return frame
+    if 'source' in frame.columns:
+        # CSVs read an empty source back as NaN
+        frame['source'] = frame['source'].fillna('')
+    keys = [c for c in ('start', 'end', 'source') if c in frame.columns]
+    frame = frame.drop_duplicates(subset=keys, keep='last')
+    return frame[(frame['start'] >= start) & (frame['start'] < end)]
+
+
+def aggregate(frame, data_type, freq):
+    """Vectorized per-period aggregation of one data type"""
+    spec = ROLLUP_SPECS[data_type]
+    if data_type == 'sleep':
+        frame = frame.assign(sleep_minutes=(frame['end'] - frame['start']).dt.total_seconds() / 60)
+        frame = frame[~frame['sleep_type'].isin(NOT_ASLEEP)]
+
+    periods = frame['start'].dt.to_period(freq)
+    named = {f'{column}_{fn}': (column, fn) for column, fns in spec.items() for fn in fns}
+    result = frame.groupby(periods).agg(samples=('start', 'size'), **named)
+    result.index.name = 'period'
+    result.insert(0, 'period_start', result.index.start_time)
+    result.insert(1, 'period_end', result.index.end_time.floor('s'))
+    result.index = result.index.astype(str)
+    return result.reset_index()
+
+
+def update_rollups(project_root, folder, data_type, new_rows, db=None):
+    """Recompute the rollup periods touched by new_rows; returns the files written"""
+    if data_type not in ROLLUP_SPECS or not new_rows:
+        return []
+
+    touched = to_frame(new_rows)['start']
+    written = []
+    for period, freq in PERIODS.items():
+        touched_periods = touched.dt.to_period(freq).unique()
+        start = min(touched_periods).start_time
+        end = max(touched_periods).end_time
+
+        base = load_base_rows(project_root, folder, data_type, new_rows, start, end, db)
+        base = base[base['start'].dt.to_period(freq).isin(touched_periods)]
+        fresh = aggregate(base, data_type, freq)
+
+        path = rollup_path(project_root, folder, data_type, period)
+        if os.path.exists(path):
+            existing = pd.read_csv(path, parse_dates=['period_start', 'period_end'], dtype={'period': str})
+            keep = existing[~existing['period'].isin(touched_periods.astype(str))]
+            fresh = pd.concat([keep, fresh], ignore_index=True).sort_values('period_start')
+
+        writers.write_csv(fresh, path)
+        written.append(path)
+    return written
@@ -0,0 +1,127 @@
+"""
+Optional SQLite sink for synced Google Fit data.
+
+Each data type gets its own table keyed on (start, end, source), so the
+primary key doubles as a time index for range queries. The database runs in
+WAL mode, which lets readers query while a sync is writing. Syncs use it when
+GOOGLE_FIT_DB points at a database file.
+"""
+
+import math
+import os
+import re
+import sqlite3
+
+# SQLite column type for each Google Fit value key
+COLUMN_TYPES = {'intVal': 'INTEGER', 'fpVal': 'REAL'}
+
+
+def open_store(path):
+    """Open (creating if needed) the database at path in WAL mode"""
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def open_from_env(project_root):
+    """Open the database GOOGLE_FIT_DB names (relative to project_root), or return None if unset"""
+    db_path = os.getenv("GOOGLE_FIT_DB")
+    return open_store(os.path.join(project_root, db_path)) if db_path else None
+
+
+def table_name(data_type):
+    if not re.fullmatch(r'[a-z_]+', data_type):
+        raise ValueError(f"Invalid data type: {data_type}")
+    return data_type
+
+
+def ensure_table(conn, data_type, fields):
+    """Create the table for a data type from its (column, value key) fields"""
+    table = table_name(data_type)
+    value_columns = ", ".join(f'"{column}" {COLUMN_TYPES[value_key]}' for column, value_key in fields)
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{table}" ('
+        f'"start" TEXT NOT NULL, "end" TEXT NOT NULL, "source" TEXT NOT NULL DEFAULT \'\', '
+        f'{value_columns}, PRIMARY KEY ("start", "end", "source")) WITHOUT ROWID'
+    )
+    return table
+
+
+def format_time(value):
+    """Store timestamps as sortable 'YYYY-MM-DD HH:MM:SS' text, like the CSVs"""
+    if isinstance(value, str):
+        return value
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def upsert_rows(conn, data_type, fields, rows, window=None):
+    """Insert or update a batch of rows in a single transaction
+
+    With a (start, end) window, stored rows starting inside it are deleted
+    first. The last bucket of a sync ends at the time it ran, so a later sync
+    returns the same bucket with a different end; the key alone would keep both.
+    """
+    table = ensure_table(conn, data_type, fields)
+    if not rows:
+        return 0
+
+    columns = [column for column, _ in fields]
+    names = ", ".join(f'"{c}"' for c in ['start', 'end', 'source'] + columns)
+    placeholders = ", ".join("?" * (len(columns) + 3))
+    updates = ", ".join(f'"{c}" = excluded."{c}"' for c in columns)
+    sql = (f'INSERT INTO "{table}" ({names}) VALUES ({placeholders}) '
+           f'ON CONFLICT ("start", "end", "source") DO UPDATE SET {updates}')
+
+    params = []
+    for row in rows:
+        source = row.get('source')
+        # Rows reloaded from checkpoint CSVs carry NaN for a missing source
+        if not isinstance(source, str):
+            source = ''
+        params.append([format_time(row['start']), format_time(row['end']), source] + [clean_value(row.get(c)) for c in columns])
+
+    with conn:
+        if window is not None:
+            conn.execute(f'DELETE FROM "{table}" WHERE "start" >= ? AND "start" < ?',
+                         [format_time(w) for w in window])
+        conn.executemany(sql, params)
+    return len(params)
+
+
+def query_range(conn, data_type, start, end, limit=None, after=None):
+    """Return rows whose start falls in [start, end), oldest first
+
+    after is the (start, end, source) key of the last row already seen, for
+    keyset pagination that stays on the primary key index.
+    """
+    table = table_name(data_type)
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    if not exists:
+        return []
+
+    sql = f'SELECT * FROM "{table}" WHERE "start" >= ? AND "start" < ?'
+    params = [format_time(start), format_time(end)]
+    if after is not None:
+        sql += ' AND ("start", "end", "source") > (?, ?, ?)'
+        params += list(after)
+    sql += ' ORDER BY "start", "end", "source"'
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    cursor = conn.execute(sql, params)
+    names = [d[0] for d in cursor.description]
+    return [dict(zip(names, values)) for values in cursor.fetchall()]
+
+
+def list_tables(conn):
+    """Names of the data type tables present in the store"""
+    cursor = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+    return [name for (name,) in cursor.fetchall()]
+
+
+def clean_value(value):
+    """Map pandas NaN to SQL NULL"""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
@@ -0,0 +1,126 @@
+"""
+Shared OAuth token store.
+
+Every sync thread and process uses the same token file in the home directory.
+Refreshing it is serialised with an exclusive lock on a sibling .lock file.
+The lock holder re-reads the token first and only calls Google when the stored
+access token is still expired. When several workers find an expired token at
+once, exactly one refreshes it and the others pick up the new access token, so
+refresh traffic does not grow with the number of workers. Tokens are written
+through writers.replace_atomically, so a reader never sees a half-written file.
+"""
+
+import contextlib
+import json
+import os
+import threading
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+import progress
+import writers
+
+LOCK_SUFFIX = '.lock'
+
+# File locks are held per open file, so threads of one process queue here first
+_thread_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def locked(token_file):
+    """Hold the cross-process lock for token_file"""
+    with _thread_lock, open(token_file + LOCK_SUFFIX, 'a+') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK gives up after ten seconds; an OAuth consent can take longer
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class SharedCredentials(Credentials):
+    """Credentials whose refreshes go through the shared token file
+
+    The API client refreshes credentials on its own when the access token
+    expires during a long sync; this keeps those refreshes coordinated too.
+    """
+
+    token_file = None
+
+    def refresh(self, request):
+        if self.token_file is None:
+            return super().refresh(request)
+        with locked(self.token_file):
+            stored = read_token(self.token_file, self.scopes)
+            if stored is not None and stored.valid and (stored.token != self.token or self.expired):
+                # Another worker refreshed while this one was waiting
+                self.token = stored.token
+                self.expiry = stored.expiry
+                self._refresh_token = stored.refresh_token
+                return
+            super().refresh(request)
+            save_token(self.token_file, self)
+            progress.logger.info("Refreshed access token in %s", self.token_file)
+
+
+def read_token(token_file, scopes):
+    """Stored credentials for token_file, or None if there is no usable token"""
+    try:
+        with open(token_file, 'r') as f:
+            info = json.load(f)
+        creds = SharedCredentials.from_authorized_user_info(info, scopes)
+    except (OSError, ValueError):
+        return None
+    creds.token_file = token_file
+    return creds
+
+
+def save_token(token_file, creds):
+    """Atomically replace the stored token"""
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            f.write(creds.to_json())
+
+    # The token grants account access, so it stays readable by the owner only
+    writers.replace_atomically(write, token_file, mode=0o600)
+
+
+def load_credentials(token_file, scopes, authorize):
+    """Valid credentials for token_file, refreshed or authorized by one process at a time
+
+    authorize() runs the interactive OAuth flow and returns new credentials;
+    it is only called when there is no token with a refresh token.
+    """
+    creds = read_token(token_file, scopes)
+    if creds is not None and creds.valid:
+        return creds
+
+    with locked(token_file):
+        # Whoever held the lock before may already have refreshed the token
+        creds = read_token(token_file, scopes)
+        if creds is not None and creds.valid:
+            return creds
+        if creds is not None and creds.expired and creds.refresh_token:
+            Credentials.refresh(creds, Request())
+            progress.logger.info("Refreshed access token in %s", token_file)
+        else:
+            creds = authorize()
+        save_token(token_file, creds)
+    return read_token(token_file, scopes)
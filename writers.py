@@ -0,0 +1,212 @@
+"""
+Output writers for synced data.
+
+Files are written to a temporary file in the destination folder and then
+moved into place with os.replace, so readers only ever see a complete file.
+CSV exports can optionally be stream-compressed with gzip or zstd:
+
+    GOOGLE_FIT_COMPRESSION=gzip|zstd
+    GOOGLE_FIT_COMPRESSION_LEVEL=6
+
+GOOGLE_FIT_EXPORT=arrow additionally writes each data type as an Arrow IPC
+file that analytics jobs can memory-map instead of parsing CSV.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# File suffix added for each compression method
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# Read once: os.umask can only be queried by setting it, which races other threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def compression_from_env():
+    """Return (method, level) configured through the environment"""
+    method = (os.getenv("GOOGLE_FIT_COMPRESSION") or '').lower() or None
+    if method == 'none':
+        method = None
+    if method not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unsupported GOOGLE_FIT_COMPRESSION: {method} (use gzip or zstd)")
+    level = os.getenv("GOOGLE_FIT_COMPRESSION_LEVEL")
+    return method, int(level) if level else None
+
+
+def arrow_export_from_env():
+    """True if GOOGLE_FIT_EXPORT asks for Arrow files"""
+    return 'arrow' in (os.getenv("GOOGLE_FIT_EXPORT") or '').lower().split(',')
+
+
+def compression_options(method, level):
+    """pandas compression argument for a method and level"""
+    if method is None:
+        return None
+    options = {'method': method}
+    if level is not None:
+        options['compresslevel' if method == 'gzip' else 'level'] = level
+    return options
+
+
+def find_output(path):
+    """Return the existing file for path, whichever compression it was written with"""
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return None
+
+
+def replace_atomically(write, path, mode=None):
+    """Call write(tmp_path), fsync the result and move it over path
+
+    The new file keeps the mode of the one it replaces. A new path gets mode,
+    or the usual umask-based permissions instead of mkstemp's private 0600.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path), suffix='.tmp', dir=directory)
+    os.close(fd)
+    try:
+        write(tmp_path)
+        with open(tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        if mode is None:
+            try:
+                mode = os.stat(path).st_mode & 0o777
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def replace_overlapping(base, new):
+    """base without the rows that overlap any row of new in time, followed by new
+
+    A bucket from an earlier sync can cover the same hours as a newer one with
+    a different start or end (a partial last bucket, or a daily window started
+    at another time), so matching on the exact key is not enough.
+    """
+    if new.empty:
+        return base
+    if base.empty:
+        return new
+    new = new.sort_values(['start', 'end'])
+    starts = new['start'].values
+    ends = np.maximum.accumulate(new['end'].values)
+    # Latest new row starting before each base row ends; any overlap reaches past the base start
+    last = np.searchsorted(starts, base['end'].values, side='left') - 1
+    overlaps = (last >= 0) & (ends[np.maximum(last, 0)] > base['start'].values)
+    return pd.concat([base[~overlaps], new], ignore_index=True)
+
+
+def write_csv(rows, path, compression=None, level=None):
+    """Atomically write rows (a DataFrame or list of dicts) as CSV; returns the final path
+
+    With compression the matching suffix (.gz or .zst) is appended to path,
+    and copies of the same file in other formats are removed.
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unsupported compression: {compression}")
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+    final_path = path + COMPRESSION_SUFFIXES[compression]
+    options = compression_options(compression, level)
+
+    try:
+        replace_atomically(lambda tmp_path: frame.to_csv(tmp_path, index=False, compression=options), final_path)
+    except ImportError:
+        raise RuntimeError("zstd compression needs the zstandard package (pip install zstandard)")
+
+    # Drop stale copies so readers never pick up an older format
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if path + suffix != final_path and os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return final_path
+
+
+def arrow_schema(fields):
+    """Arrow schema for a data type's (column, value key) fields"""
+    import pyarrow as pa
+
+    value_types = {'intVal': pa.int64(), 'fpVal': pa.float64()}
+    columns = [('start', pa.timestamp('ms')), ('end', pa.timestamp('ms')), ('source', pa.string())]
+    columns += [(column, value_types[value_key]) for column, value_key in fields]
+    return pa.schema(columns)
+
+
+def write_arrow(rows, path, fields, append=False):
+    """Atomically write rows as an Arrow IPC (Feather v2) file; returns path
+
+    With append=True the existing file is memory-mapped and its record
+    batches are carried over without copying. Rows starting at or after the
+    first new row are dropped from the tail first, so the overlapping day of
+    an incremental sync is replaced rather than duplicated.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        raise RuntimeError("Arrow export needs the pyarrow package (pip install pyarrow)")
+
+    schema = arrow_schema(fields)
+    frame = pd.DataFrame(rows, columns=schema.names)
+    frame['start'] = pd.to_datetime(frame['start'])
+    frame['end'] = pd.to_datetime(frame['end'])
+    frame['source'] = frame['source'].fillna('')
+    frame = frame.sort_values(['start', 'end'])
+    new_batch = pa.RecordBatch.from_pandas(frame, schema=schema, preserve_index=False)
+
+    def write(tmp_path):
+        with pa.ipc.new_file(tmp_path, schema) as writer:
+            if append and os.path.exists(path):
+                cutoff = pa.scalar(frame['start'].min(), pa.timestamp('ms')) if len(frame) else None
+                with pa.memory_map(path, 'r') as source:
+                    reader = pa.ipc.open_file(source)
+                    if not reader.schema.equals(schema):
+                        raise ValueError(f"{path} was written with a different schema")
+                    for i in range(reader.num_record_batches):
+                        batch = reader.get_batch(i)
+                        if cutoff is not None and batch.num_rows and pc.max(batch['start']).as_py() >= cutoff.as_py():
+                            batch = batch.filter(pc.less(batch['start'], cutoff))
+                        if batch.num_rows:
+                            writer.write_batch(batch)
+            if new_batch.num_rows:
+                writer.write_batch(new_batch)
+
+    replace_atomically(write, path)
+    return path
+
+
+def merge_arrow(rows, path, fields):
+    """Atomically merge rows into an existing Arrow file; returns path
+
+    Unlike an append, rows may fall anywhere in the file's range. A new row
+    replaces every stored row it overlaps in time.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("Arrow export needs the pyarrow package (pip install pyarrow)")
+
+    frame = pd.DataFrame(rows)
+    if os.path.exists(path):
+        with pa.OSFile(path, 'rb') as source:
+            reader = pa.ipc.open_file(source)
+            if not reader.schema.equals(arrow_schema(fields)):
+                raise ValueError(f"{path} was written with a different schema")
+            existing = reader.read_pandas()
+        for column in ('start', 'end'):
+            # Arrow gives millisecond timestamps, which pandas can't concat with nanosecond ones
+            existing[column] = existing[column].astype('datetime64[ns]')
+            frame[column] = pd.to_datetime(frame[column])
+        frame = replace_overlapping(existing, frame)
+        frame['source'] = frame['source'].fillna('')
+        frame = frame.drop_duplicates(subset=['start', 'end', 'source'], keep='last')
+    return write_arrow(frame, path, fields)